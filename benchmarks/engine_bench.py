@@ -0,0 +1,344 @@
+# benchmarks/engine_bench.py
+"""
+Headless keystroke-trace replay benchmark for SmartMacroEngine.
+
+Feeds synthetic (or recorded) keystroke traces through the engine's key hook
+using the in-memory backends and a virtual clock, against generated rule sets,
+and prints machine-readable JSON results.
+
+    python -m benchmarks.engine_bench
+    python -m benchmarks.engine_bench --sizes 10 1000 --traces bursty --out bench.json
+    python -m benchmarks.engine_bench --trace recorded.jsonl
+
+A recorded trace is JSON lines of {"t": seconds, "key": name}.
+"""
+import argparse
+import json
+import platform
+import random
+import string
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+from core.backends import FakeKeySink, FakeKeySource, SystemClock, fake_backends
+from core.parser import RuleSpec, parse_logic
+from core.smart_macro_engine import SmartMacroEngine
+
+ALPHABET = string.ascii_lowercase + string.digits
+KEY_LENGTHS = (1, 2, 2, 2, 3, 3, 3, 4, 4, 4)  # Rough shape of real trigger sets
+DEFAULT_SIZES = (10, 1000, 10000, 100000)
+TRACES = ("realistic", "bursty", "adversarial")
+
+
+# -------------------------
+# Generators
+# -------------------------
+def generate_rules(count, seed=0):
+    """count unique (keys, output) pairs"""
+    rng = random.Random(seed)
+    seen = set()
+    rules = []
+    singles = 0
+    while len(rules) < count:
+        length = rng.choice(KEY_LENGTHS)
+        if length == 1 and singles >= len(ALPHABET):
+            continue
+        keys = tuple(rng.choice(ALPHABET) for _ in range(length))
+        if keys in seen:
+            continue
+        seen.add(keys)
+        singles += length == 1
+        words = " ".join("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 8)))
+                         for _ in range(rng.randint(1, 4)))
+        rules.append((list(keys), words))
+    return rules
+
+
+def generate_trace(kind, rules, keys=2000, seed=0):
+    """List of (gap_before_seconds, key) for the given trace kind"""
+    rng = random.Random(seed)
+    trace = []
+    if kind == "realistic":
+        # ~80 wpm typing with an expansion trigger every so often
+        while len(trace) < keys:
+            if rules and rng.random() < 0.1:
+                for key in rng.choice(rules)[0]:
+                    trace.append((0.08, key))
+            else:
+                trace.append((max(0.03, rng.gauss(0.12, 0.04)), rng.choice(ALPHABET)))
+    elif kind == "bursty":
+        # Fast bursts separated by pauses
+        while len(trace) < keys:
+            trace.append((rng.uniform(0.4, 1.5), rng.choice(ALPHABET)))
+            for _ in range(rng.randint(8, 20)):
+                trace.append((0.015, rng.choice(ALPHABET)))
+    elif kind == "adversarial":
+        # Live prefixes of long rules that never complete
+        long_rules = [r[0] for r in rules if len(r[0]) > 1] or [[ALPHABET[0], ALPHABET[1]]]
+        while len(trace) < keys:
+            prefix = rng.choice(long_rules)[:-1]
+            for key in prefix:
+                trace.append((0.02, key))
+            trace.append((0.02, "space"))
+    else:
+        raise ValueError(f"Unknown trace kind '{kind}'")
+    return trace[:keys]
+
+
+def load_trace(path):
+    """Recorded trace (JSON lines of {"t", "key"}) as (gap, key) pairs"""
+    trace = []
+    last = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            t = float(entry["t"])
+            trace.append((0.0 if last is None else max(0.0, t - last), entry["key"]))
+            last = t
+    return trace
+
+
+# -------------------------
+# Measurement helpers
+# -------------------------
+def summarize(samples, scale=1e6):
+    """mean / p50 / p99 / max, scaled (default: seconds -> microseconds)"""
+    if not samples:
+        return {"n": 0, "mean": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        "n": n,
+        "mean": round(sum(ordered) / n * scale, 3),
+        "p50": round(ordered[n // 2] * scale, 3),
+        "p99": round(ordered[min(n - 1, int(n * 0.99))] * scale, 3),
+        "max": round(ordered[-1] * scale, 3),
+    }
+
+
+def expansion_latencies(events):
+    """Virtual time from the last user key to the first typed char of each expansion"""
+    latencies = []
+    last_user = None
+    in_run = False
+    wrote = False
+    for t, action, _ in events:
+        if action == "deliver":
+            last_user = t
+            in_run = False
+            continue
+        if not in_run:
+            in_run, wrote = True, False
+        if action in ("write", "paste") and not wrote and last_user is not None:
+            latencies.append(t - last_user)
+            wrote = True
+    return latencies
+
+
+def load_engine(engine, rules):
+    """Insert rules in one add_rules() batch (matchers built once); returns the seconds taken"""
+    specs = [RuleSpec(line, keys, output, 0.5, 0.0, 0.0) for line, (keys, output) in enumerate(rules, 1)]
+    start = time.perf_counter()
+    engine.add_rules(specs)
+    return time.perf_counter() - start
+
+
+def rules_memory(rules):
+    """Bytes held by an engine after loading rules (tracemalloc, separate engine)"""
+    source, sink, clock = fake_backends()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    engine = SmartMacroEngine(key_source=source, key_sink=sink, clock=clock)
+    load_engine(engine, rules)
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return current - baseline
+
+
+# -------------------------
+# Scenarios
+# -------------------------
+def run_virtual(rules, trace, trace_name, measure_memory=True):
+    source, sink, clock = fake_backends()
+    engine = SmartMacroEngine(key_source=source, key_sink=sink, clock=clock)
+    load_seconds = load_engine(engine, rules)
+
+    hook, deadlines = [], []
+    for gap, key in trace:
+        t0 = time.perf_counter()
+        clock.advance(gap)
+        t1 = time.perf_counter()
+        source.tap(key)
+        t2 = time.perf_counter()
+        deadlines.append(t1 - t0)
+        hook.append(t2 - t1)
+    t0 = time.perf_counter()
+    clock.advance(5.0)  # Drain pending deadlines
+    deadlines.append(time.perf_counter() - t0)
+
+    latencies = expansion_latencies(sink.events)
+    result = {
+        "mode": "virtual",
+        "trace": trace_name,
+        "rules": len(rules),
+        "keys": len(trace),
+        "add_rule_us": round(load_seconds / max(1, len(rules)) * 1e6, 3),
+        "load_seconds": round(load_seconds, 4),
+        "hook_us": summarize(hook),
+        "deadline_us": summarize(deadlines),
+        "trigger_to_first_char_ms": summarize(latencies, scale=1e3),
+        "expansions": len(latencies),
+        "synthetic_events": len(sink.synthetic()),
+    }
+    if measure_memory:
+        bytes_used = rules_memory(rules)
+        result["rules_bytes"] = bytes_used
+        result["bytes_per_rule"] = round(bytes_used / max(1, len(rules)), 1)
+    return result
+
+
+def rules_to_logic(rules, seed=0):
+    """Render rules as logic text, cycling through all four line formats"""
+    rng = random.Random(seed)
+    formats = ("if {k} {{ {o}, 0.02, 0.1, 1.0 }}", "{k} = {o}", "{k}: {o} | a:0.1 b=0.2", "if {k} {{ {o} | x:0.1 }}")
+    return "\n".join(rng.choice(formats).format(k="+".join(keys), o=output) for keys, output in rules)
+
+
+def run_parse(rules):
+    """Logic parsing alone, then parse + batch insert into a fresh engine"""
+    text = rules_to_logic(rules)
+    t0 = time.perf_counter()
+    parsed = parse_logic(text)
+    parse_seconds = time.perf_counter() - t0
+
+    source, sink, clock = fake_backends()
+    engine = SmartMacroEngine(key_source=source, key_sink=sink, clock=clock)
+    t0 = time.perf_counter()
+    loaded = engine.load_logic(text)
+    load_seconds = time.perf_counter() - t0
+    return {
+        "mode": "parse",
+        "rules": len(rules),
+        "lines": parsed.lines,
+        "parse_seconds": round(parse_seconds, 4),
+        "load_logic_seconds": round(load_seconds, 4),
+        "added": loaded.added,
+        "diagnostics": len(loaded.diagnostics),
+    }
+
+
+def run_realtime(rules, trace, trace_name):
+    """Real threads and clock, fake sink: thread count and wall-clock latency"""
+    clock = SystemClock()
+    sink = FakeKeySink(clock)
+    source = FakeKeySource(sink)
+    engine = SmartMacroEngine(key_source=source, key_sink=sink, clock=clock, settle_delay=0)
+    load_engine(engine, rules)
+
+    baseline_threads = threading.active_count()
+    max_threads = baseline_threads
+    hook = []
+    for gap, key in trace:
+        time.sleep(gap)
+        t0 = time.perf_counter()
+        source.tap(key)
+        hook.append(time.perf_counter() - t0)
+        max_threads = max(max_threads, threading.active_count())
+    time.sleep(1.0)
+    return {
+        "mode": "realtime",
+        "trace": trace_name,
+        "rules": len(rules),
+        "keys": len(trace),
+        "hook_us": summarize(hook),
+        "threads_baseline": baseline_threads,
+        "threads_max": max_threads,
+        "trigger_to_first_char_ms": summarize(expansion_latencies(sink.events), scale=1e3),
+    }
+
+
+def run_typing():
+    """Wall-clock cost of walking typing plans (virtual clock, so no real sleeps)"""
+    source, sink, clock = fake_backends()
+    engine = SmartMacroEngine(key_source=source, key_sink=sink, clock=clock, settle_delay=0)
+    engine.add_rule(["x"], "lorem ipsum " * 500, 0.5, 0.0, 0.0)
+    engine.add_rule(["y"], "lorem ipsum " * 50, 0.5, 0.01, 0.05)
+    results = []
+    for rule in engine.rules:
+        samples = []
+        for _ in range(20):
+            sink.clear()
+            t0 = time.perf_counter()
+            engine._type_output(rule, 1, rule["keys"])
+            samples.append(time.perf_counter() - t0)
+        results.append({
+            "mode": "typing",
+            "output_chars": len(rule["output"]),
+            "char_delay": rule["char_delay"],
+            "sink_calls": len(sink.events),
+            "type_output_us": summarize(samples),
+        })
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--traces", nargs="+", choices=TRACES, default=list(TRACES))
+    parser.add_argument("--trace", help="Replay a recorded JSONL trace instead of synthetic ones")
+    parser.add_argument("--keys", type=int, default=2000, help="Keystrokes per synthetic trace")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc rule-set sizing")
+    parser.add_argument("--no-realtime", action="store_true", help="Skip the real-thread scenario")
+    parser.add_argument("--out", help="Write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        rules = generate_rules(size, args.seed)
+        if args.trace:
+            traces = [(args.trace, load_trace(args.trace))]
+        else:
+            traces = [(kind, generate_trace(kind, rules, args.keys, args.seed)) for kind in args.traces]
+        for i, (name, trace) in enumerate(traces):
+            results.append(run_virtual(rules, trace, name, measure_memory=not args.no_memory and i == 0))
+            print(f"{size} rules / {name}: done", file=sys.stderr)
+        results.append(run_parse(rules))
+
+    if not args.no_realtime:
+        rules = generate_rules(1000, args.seed)
+        trace = [(0.005, key) for _, key in generate_trace("bursty", rules, 300, args.seed)]
+        results.append(run_realtime(rules, trace, "bursty-5ms"))
+    results.extend(run_typing())
+
+    report = {
+        "benchmark": "engine_bench",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# benchmarks/startup_bench.py
+"""
+Import and startup time of MacroMaster-Pro, each sample in a fresh interpreter.
+
+Reports how long the core modules, the headless entry point and the GUI take
+to import, which GUI/input libraries each import pulls in, and the time from
+interpreter start to a loaded engine (parsed and from the compiled cache) and
+to a validated rules file (main.py --check). Prints JSON like engine_bench.
+
+    python -m benchmarks.startup_bench
+    python -m benchmarks.startup_bench --sizes 1000 100000 --repeat 10 --out startup.json
+
+The headless scenario uses the in-memory backends: the real ones need a
+keyboard hook and a display. GUI rows report an error where customtkinter
+is not installed.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.engine_bench import generate_rules, git_revision, rules_to_logic, summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("customtkinter", "tkinter", "pyautogui", "keyboard", "pyperclip")
+MODULES = ("core.parser", "core.smart_macro_engine", "core.daemon", "ui.interface")
+DEFAULT_SIZES = (1000, 100000)
+
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start,
+                  "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+HEADLESS_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+from core.backends import fake_backends
+from core.smart_macro_engine import SmartMacroEngine
+import core.storage
+imported = time.perf_counter()
+core.storage.CACHE_DIR = {cache_dir!r}  # The bench's temp dir, not the user's cache
+source, sink, clock = fake_backends()
+engine = SmartMacroEngine(key_source=source, key_sink=sink, clock=clock)
+result = engine.load_rules({path!r}, use_cache={use_cache!r})
+print(json.dumps({{"seconds": time.perf_counter() - start, "import_seconds": imported - start,
+                  "cached": result.cached, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def run_python(args, ok=(0,)):
+    """Wall time of a fresh interpreter run from the repo root, and its last stdout line"""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable] + args, cwd=ROOT, capture_output=True, text=True, timeout=600)
+    wall = time.perf_counter() - start
+    if proc.returncode not in ok:
+        lines = proc.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit code {proc.returncode}")
+    out = proc.stdout.strip().splitlines()
+    return wall, out[-1] if out else ""
+
+
+def sample(args, repeat, ok=(0,)):
+    """repeat runs of args -> wall times plus the JSON the runs printed (if any)"""
+    walls, reports = [], []
+    for _ in range(repeat):
+        wall, last = run_python(args, ok)
+        walls.append(wall)
+        if last.startswith("{"):
+            reports.append(json.loads(last))
+    return walls, reports
+
+
+def run_imports(repeat):
+    results = []
+    for module in MODULES:
+        row = {"mode": "import", "module": module}
+        try:
+            walls, reports = sample(["-c", IMPORT_SNIPPET.format(module=module, heavy=HEAVY)], repeat)
+        except RuntimeError as e:
+            row["error"] = str(e)
+        else:
+            row["import_ms"] = summarize([r["seconds"] for r in reports], 1e3)
+            row["process_ms"] = summarize(walls, 1e3)
+            row["loaded"] = reports[-1]["loaded"]
+        results.append(row)
+    return results
+
+
+def run_headless(path, rules, repeat):
+    results = []
+    for use_cache in (False, True):
+        snippet = ["-c", HEADLESS_SNIPPET.format(path=path, use_cache=use_cache, heavy=HEAVY,
+                                                 cache_dir=os.path.join(os.path.dirname(path), "cache"))]
+        if use_cache:
+            run_python(snippet)  # Writes the compiled cache the measured runs read
+        walls, reports = sample(snippet, repeat)
+        results.append({
+            "mode": "headless",
+            "rules": rules,
+            "cached": reports[-1]["cached"],
+            "import_ms": summarize([r["import_seconds"] for r in reports], 1e3),
+            "ready_ms": summarize([r["seconds"] for r in reports], 1e3),
+            "process_ms": summarize(walls, 1e3),
+            "loaded": reports[-1]["loaded"],
+        })
+    return results
+
+
+def run_check(path, rules, repeat):
+    walls, _ = sample(["main.py", "--check", path], repeat, ok=(0, 1))  # 1: the file has errors
+    return {"mode": "check", "rules": rules, "process_ms": summarize(walls, 1e3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = run_imports(args.repeat)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"rules_{size}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(rules_to_logic(generate_rules(size, args.seed), args.seed) + "\n")
+            results.extend(run_headless(path, size, args.repeat))
+            results.append(run_check(path, size, args.repeat))
+            print(f"{size} rules: done", file=sys.stderr)
+
+    report = {
+        "benchmark": "startup_bench",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
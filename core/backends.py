@@ -0,0 +1,243 @@
+# core/backends.py
+"""
+Input/output backends for SmartMacroEngine.
+
+The engine talks to the outside world through three small interfaces:
+  key source - delivers key events to a callback (the keyboard hook)
+  key sink   - emits synthetic keystrokes and text, and reads/writes the
+               clipboard for pasted expansions
+  clock      - now(), sleep() and sleep_until() on a monotonic timeline
+
+The real backends wrap `keyboard` and `pyautogui` (plus `pyperclip`, which
+pyautogui depends on, for the clipboard) and import them lazily, so the
+engine can be constructed with the fakes on a headless machine.
+"""
+import sys
+import threading
+import time
+
+
+class KeyEvent:
+    """Minimal stand-in for keyboard.KeyboardEvent (only what the engine reads)"""
+
+    __slots__ = ("name", "event_type", "time")
+
+    def __init__(self, name, event_type="down", time=None):
+        self.name = name
+        self.event_type = event_type
+        self.time = time
+
+
+# -------------------------
+# Real backends
+# -------------------------
+class SystemClock:
+    virtual = False
+    SPIN_THRESHOLD = 0.002  # Busy-wait the last few ms; sleep() granularity is coarser
+
+    def now(self):
+        return time.perf_counter()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def sleep_until(self, deadline):
+        """Sleep until now() reaches deadline; returns at once if already late"""
+        remaining = deadline - time.perf_counter()
+        if remaining > self.SPIN_THRESHOLD:
+            time.sleep(remaining - self.SPIN_THRESHOLD)
+        while time.perf_counter() < deadline:
+            pass
+
+
+class KeyboardSource:
+    """Global keyboard hook via the `keyboard` library"""
+
+    def start(self, callback, suppress=False):
+        import keyboard
+
+        def listen():
+            keyboard.hook(callback, suppress=suppress)
+            keyboard.wait()
+
+        threading.Thread(target=listen, name="macro-keyboard", daemon=True).start()
+
+
+class PyAutoGUISink:
+    """
+    Synthetic input via `pyautogui`, clipboard via `pyperclip`.
+
+    Every call passes _pause=False: pyautogui otherwise sleeps PAUSE (0.1 s)
+    after each call, which would add to every batched backspace and typing
+    plan chunk. The engine paces output itself with clock deadlines.
+    """
+
+    PASTE_MODIFIER = "command" if sys.platform == "darwin" else "ctrl"
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+        self._pyperclip = None
+
+    def press(self, key, presses=1):
+        self._pyautogui.press(key, presses=presses, interval=0, _pause=False)
+
+    def write(self, text):
+        self._pyautogui.write(text, interval=0, _pause=False)
+
+    def paste(self):
+        """Send the paste shortcut to the focused application"""
+        self._pyautogui.hotkey(self.PASTE_MODIFIER, "v", _pause=False)
+
+    def _clipboard(self):
+        if self._pyperclip is None:
+            import pyperclip
+            self._pyperclip = pyperclip
+        return self._pyperclip
+
+    def get_clipboard(self):
+        """Clipboard text ("" if it is empty or holds something else)"""
+        return self._clipboard().paste()
+
+    def set_clipboard(self, text):
+        self._clipboard().copy(text)
+
+
+# -------------------------
+# In-memory fakes
+# -------------------------
+class VirtualClock:
+    """
+    Manually advanced clock. Schedulers attached to it run no thread; their
+    callbacks fire from advance() in deadline order, at their virtual deadline.
+    sleep() moves time forward without firing timers.
+    """
+
+    virtual = True
+
+    def __init__(self, start=0.0):
+        self._now = start
+        self._pumps = []
+
+    def attach(self, pump):
+        """Register an object with next_deadline() and run_due()"""
+        self._pumps.append(pump)
+
+    def now(self):
+        return self._now
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self._now += seconds
+
+    def sleep_until(self, deadline):
+        self._now = max(self._now, deadline)
+
+    def advance(self, seconds=0.0):
+        """Move time forward, firing every deadline that falls inside the step"""
+        target = self._now + seconds
+        while True:
+            deadlines = [d for d in (p.next_deadline() for p in self._pumps) if d is not None]
+            if not deadlines or min(deadlines) > target:
+                break
+            self._now = max(self._now, min(deadlines))
+            for pump in self._pumps:
+                pump.run_due()
+        self._now = max(self._now, target)
+
+
+class FakeKeySource:
+    """
+    Key source driven by the caller; returns the engine's pass/swallow verdict.
+    Key-downs that are not swallowed are delivered to the sink, if given, so
+    it sees what the focused application would.
+    """
+
+    def __init__(self, sink=None):
+        self.callback = None
+        self.suppress = False
+        self.sink = sink
+
+    def start(self, callback, suppress=False):
+        self.callback = callback
+        self.suppress = suppress
+
+    def down(self, name):
+        verdict = self.callback(KeyEvent(name, "down"))
+        if self.sink is not None and not (self.suppress and verdict is False):
+            self.sink.deliver(name)
+        return verdict
+
+    def up(self, name):
+        return self.callback(KeyEvent(name, "up"))
+
+    def tap(self, name):
+        """Press and release; returns the key-down verdict"""
+        verdict = self.down(name)
+        self.up(name)
+        return verdict
+
+
+class FakeKeySink:
+    """
+    Records emitted keystrokes as (timestamp, action, payload) tuples.
+    action is "press", "write" or "paste" (payload: the clipboard text) for
+    synthetic input, "deliver" for user keys that reached the application.
+    """
+
+    def __init__(self, clock, clipboard=""):
+        self.clock = clock
+        self.events = []
+        self.clipboard = clipboard
+
+    def press(self, key, presses=1):
+        for _ in range(presses):
+            self.events.append((self.clock.now(), "press", key))
+
+    def write(self, text):
+        self.events.append((self.clock.now(), "write", text))
+
+    def paste(self):
+        self.events.append((self.clock.now(), "paste", self.clipboard))
+
+    def get_clipboard(self):
+        return self.clipboard
+
+    def set_clipboard(self, text):
+        self.clipboard = text
+
+    def deliver(self, key):
+        self.events.append((self.clock.now(), "deliver", key))
+
+    def synthetic(self):
+        """Only the events the engine emitted itself"""
+        return [e for e in self.events if e[1] != "deliver"]
+
+    def clear(self):
+        self.events.clear()
+
+    def text(self):
+        """Text the events would produce, applying backspaces"""
+        out = []
+        for _, action, payload in self.events:
+            if action in ("write", "paste"):
+                if payload:
+                    out.append(payload)
+            elif payload == "backspace":
+                if out:
+                    out[-1] = out[-1][:-1]
+                    if not out[-1]:
+                        out.pop()
+            elif len(payload) == 1:
+                out.append(payload)
+            elif payload == "space":
+                out.append(" ")
+        return "".join(out)
+
+
+def fake_backends(start=0.0):
+    """(key_source, key_sink, clock) wired for headless driving"""
+    clock = VirtualClock(start)
+    sink = FakeKeySink(clock)
+    return FakeKeySource(sink), sink, clock
@@ -0,0 +1,99 @@
+# core/daemon.py
+"""
+Headless operation: run the engine from a rules file with no Tk, or just
+validate a rules file.
+
+Importing this module loads no GUI or input library. check_rules() never
+touches them; run_daemon() imports `keyboard` and `pyautogui` only when the
+engine starts its real backends.
+"""
+import os
+import time
+
+from core.parser import parse_logic_file
+from core.smart_macro_engine import SmartMacroEngine
+
+
+def _print_diagnostics(result, limit=50):
+    for diagnostic in result.diagnostics[:limit]:
+        print(f"{diagnostic} - {diagnostic.text}")
+    if len(result.diagnostics) > limit:
+        print(f"... and {len(result.diagnostics) - limit} more")
+
+
+def check_rules(path):
+    """
+    Parse path and report every problem, duplicates included, without
+    building an engine. Returns a process exit code (1 if any error).
+    """
+    try:
+        result = parse_logic_file(path)
+    except OSError as e:
+        print(f"Error reading {path}: {e}")
+        return 1
+    seen = set()
+    for spec in result.rules:
+        key = (spec.profile, tuple(spec.keys))
+        if key in seen:
+            result.error(spec.line, f"Sequence '{'+'.join(spec.keys)}' already exists!", spec.text)
+        seen.add(key)
+    result.diagnostics.sort(key=lambda d: d.line)
+    _print_diagnostics(result)
+    profiles = {spec.profile for spec in result.rules if spec.profile is not None}
+    print(f"{path}: {len(result.rules)} rules, {len(profiles)} profiles, {len(result.errors)} errors, "
+          f"{len(result.diagnostics) - len(result.errors)} warnings")
+    return 1 if result.errors else 0
+
+
+def start_daemon(path, profile=None, watch=True, **engine_options):
+    """
+    Build an engine on the real backends, load path and (optionally) watch it
+    for edits. Returns (engine, ParseResult); raises OSError if path cannot
+    be read and ValueError for an unknown profile.
+    """
+    engine = SmartMacroEngine(**engine_options)
+    result = engine.load_rules(path)
+    if profile is not None:
+        engine.set_active_profile(profile)
+    if watch:
+        engine.watch_rules(path, on_reload=_report_reload)
+    return engine, result
+
+
+def _report_reload(result):
+    print(f"Reloaded: {result.added} rules ({result.reused} unchanged), {len(result.errors)} errors")
+
+
+def run_daemon(path, profile=None, watch=True, on_ready=None, **engine_options):
+    """
+    start_daemon() and serve keystrokes until interrupted (Ctrl+C).
+    on_ready(engine) is called once the rules are loaded. Returns a process
+    exit code.
+    """
+    if not os.path.exists(path):
+        print(f"Error: rules file {path} not found")
+        return 1
+    try:
+        engine, result = start_daemon(path, profile, watch, **engine_options)
+    except ImportError as e:  # keyboard / pyautogui not installed
+        print(f"Error starting: {e} (the headless daemon needs the keyboard and pyautogui packages)")
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"Error starting: {e}")
+        return 1
+    _print_diagnostics(result)
+    source = "cache" if result.cached else "parsed"
+    active = f", profile '{engine.active_profile}'" if engine.active_profile else ""
+    print(f"Running headless: {result.added} rules from {path} ({source}{active}). Ctrl+C to stop.")
+    if on_ready:
+        on_ready(engine)
+
+    try:
+        # The engine runs on daemon threads; short sleeps keep Ctrl+C deliverable on every platform
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop_watching()
+    return 0
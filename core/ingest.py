@@ -0,0 +1,62 @@
+# core/ingest.py
+import threading
+from collections import deque
+
+
+class IngestWorker:
+    """
+    Hands key events from the keyboard hook to a dedicated matcher thread.
+
+    push() only appends to a deque (atomic in CPython, no lock shared with the
+    matcher) and wakes the thread; the thread drains everything queued so far
+    and passes it to the handler as one batch. The hook callback therefore
+    costs the same whatever the rule count or how long matching takes.
+
+    With threaded=False no thread is started and each push is handled inline;
+    used with a virtual clock so replays stay deterministic.
+    """
+
+    def __init__(self, handler, name="macro-matcher", threaded=True):
+        self._handler = handler
+        self._events = deque()
+        self._wake = threading.Event()
+        self.batches = 0
+        self.max_batch = 0
+        self._threaded = threaded
+        if threaded:
+            self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+            self._thread.start()
+
+    def push(self, *event):
+        if not self._threaded:
+            self._handle([event])
+            return
+        self._events.append(event)
+        self._wake.set()
+
+    def depth(self):
+        """Events pushed but not yet handed to the matcher"""
+        return len(self._events)
+
+    def stats(self):
+        return {"depth": len(self._events), "batches": self.batches, "max_batch": self.max_batch}
+
+    def _handle(self, batch):
+        self.batches += 1
+        self.max_batch = max(self.max_batch, len(batch))
+        try:
+            self._handler(batch)
+        except Exception as e:
+            print(f"Error in matcher thread: {e}")
+
+    def _run(self):
+        events = self._events
+        while True:
+            self._wake.wait()
+            # Clear before draining: a push landing after this re-arms the wait
+            self._wake.clear()
+            batch = []
+            while events:
+                batch.append(events.popleft())
+            if batch:
+                self._handle(batch)
@@ -0,0 +1,267 @@
+# core/matcher.py
+from collections import deque
+
+
+class SequenceMatcher:
+    """
+    Aho-Corasick automaton over key sequences.
+
+    The matcher itself is stateless with respect to the key stream: callers
+    keep the current state (an int) and advance it with step(). Node 0 is the
+    root, i.e. "no live prefix".
+
+    Two ways to edit it: add()/remove() leave the automaton dirty until
+    build() recompiles it (bulk loads), while insert()/delete() keep it
+    built, relinking only the nodes whose longest suffix changed (single
+    edits on a live matcher; O(affected nodes), not O(rules)).
+    """
+
+    ROOT = 0
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._goto = [{}]      # node -> {key: child node}
+        self._fail = [0]       # node -> failure link (longest proper suffix in the trie)
+        self._rule = [None]    # node -> rule ending exactly here
+        self._depth = [0]      # node -> length of the sequence it represents
+        self._parent = [0]     # node -> parent node
+        self._key = [None]     # node -> key on the edge from its parent
+        self._fails_here = [None]  # node -> {last key: nodes failing to it}, None if none do
+        self.dirty = False
+
+    # -------------------------
+    # Building
+    # -------------------------
+    def _node(self, parent, key):
+        node = len(self._goto)
+        self._goto.append({})
+        self._fail.append(0)
+        self._rule.append(None)
+        self._depth.append(self._depth[parent] + 1)
+        self._parent.append(parent)
+        self._key.append(key)
+        self._fails_here.append(None)
+        self._goto[parent][key] = node
+        return node
+
+    def add(self, rule):
+        """Insert a rule; failure links are recomputed by the next build()"""
+        node = 0
+        for key in rule.keys:
+            nxt = self._goto[node].get(key)
+            if nxt is None:
+                nxt = self._node(node, key)
+            node = nxt
+        self._rule[node] = rule
+        self.dirty = True
+
+    def remove(self, keys):
+        """Drop the rule for keys and prune trie branches that lead nowhere; build() relinks"""
+        path = self._path(keys)
+        if path is None:
+            return False
+        self._rule[path[-1]] = None
+        # Unlink childless, rule-less nodes bottom-up; their slots become unreachable
+        for i in range(len(keys), 0, -1):
+            node = path[i]
+            if self._goto[node] or self._rule[node] is not None:
+                break
+            del self._goto[path[i - 1]][keys[i - 1]]
+        self.dirty = True
+        return True
+
+    def insert(self, rule):
+        """add() on a built matcher, keeping it built"""
+        if self.dirty:
+            return self.add(rule)
+        node = 0
+        for key in rule.keys:
+            nxt = self._goto[node].get(key)
+            if nxt is None:
+                nxt = self._node(node, key)
+                self._link_new(nxt)
+            node = nxt
+        self._rule[node] = rule
+
+    def delete(self, keys):
+        """remove() on a built matcher, keeping it built"""
+        if self.dirty:
+            return self.remove(keys)
+        path = self._path(keys)
+        if path is None:
+            return False
+        self._rule[path[-1]] = None
+        for i in range(len(keys), 0, -1):
+            node = path[i]
+            if self._goto[node] or self._rule[node] is not None:
+                break
+            del self._goto[path[i - 1]][keys[i - 1]]
+            self._unlink(node)
+        return True
+
+    def _path(self, keys):
+        path = [0]
+        for key in keys:
+            node = self._goto[path[-1]].get(key)
+            if node is None:
+                return None
+            path.append(node)
+        return path
+
+    def _set_fail(self, node, fail):
+        self._fail[node] = fail
+        group = self._fails_here[fail]
+        if group is None:
+            group = self._fails_here[fail] = {}
+        group.setdefault(self._key[node], []).append(node)
+
+    def _link_new(self, node):
+        """
+        Failure link of a new node, and of every existing node whose longest
+        suffix in the trie is now this one. Those all failed to the new node's
+        own fail target and end in its key, so only that group is checked.
+        """
+        parent, key, goto, fail = self._parent[node], self._key[node], self._goto, self._fail
+        target = 0
+        if parent:
+            target = fail[parent]
+            while target and key not in goto[target]:
+                target = fail[target]
+            target = goto[target].get(key, 0)
+        group = (self._fails_here[target] or {}).get(key)
+        if group:
+            depth = self._depth[parent]
+            moved = []
+            for other in group:
+                # other ends with this node's sequence iff its parent ends with the parent's
+                up = self._parent[other]
+                while self._depth[up] > depth:
+                    up = fail[up]
+                if up == parent:
+                    moved.append(other)
+            if moved:
+                stay = set(group).difference(moved)
+                group[:] = [other for other in group if other in stay]
+                for other in moved:
+                    self._set_fail(other, node)
+        self._set_fail(node, target)
+
+    def _unlink(self, node):
+        """Drop a pruned leaf from the failure links: nodes failing to it fail to its target"""
+        target = self._fail[node]
+        self._fails_here[target][self._key[node]].remove(node)
+        orphans = self._fails_here[node]
+        if orphans:
+            for nodes in orphans.values():
+                for other in nodes:
+                    self._set_fail(other, target)
+            self._fails_here[node] = None
+
+    def copy(self):
+        """Independent matcher with the same nodes (node ids, and so match states, stay valid)"""
+        other = SequenceMatcher.__new__(SequenceMatcher)
+        other._goto = [dict(children) for children in self._goto]
+        other._fail = self._fail[:]
+        other._rule = self._rule[:]
+        other._depth = self._depth[:]
+        other._parent = self._parent[:]
+        other._key = self._key[:]
+        other._fails_here = [group and {key: nodes[:] for key, nodes in group.items()}
+                             for group in self._fails_here]
+        other.dirty = self.dirty
+        return other
+
+    def rebuild(self, rules):
+        """Recompile the automaton from scratch (used after deletions)"""
+        self.clear()
+        for rule in rules:
+            self.add(rule)
+        self.build()
+
+    def build(self):
+        """Compute failure links breadth-first"""
+        goto, fail = self._goto, self._fail
+        self._fails_here = [None] * len(goto)
+        queue = deque()
+        for child in goto[0].values():
+            self._set_fail(child, 0)
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for key, child in goto[node].items():
+                target = fail[node]
+                while target and key not in goto[target]:
+                    target = fail[target]
+                target = goto[target].get(key, 0)
+                if target == child:
+                    target = 0
+                self._set_fail(child, target)
+                queue.append(child)
+
+        self.dirty = False
+
+    # -------------------------
+    # Matching
+    # -------------------------
+    def step(self, state, key):
+        """Advance state by one key (amortized O(1))"""
+        if self.dirty:
+            self.build()
+        goto = self._goto
+        while state and key not in goto[state]:
+            state = self._fail[state]
+        return goto[state].get(key, 0)
+
+    def scan(self, keys):
+        """State after feeding keys from the root"""
+        state = 0
+        for key in keys:
+            state = self.step(state, key)
+        return state
+
+    def matches(self, state):
+        """Rules that are suffixes of the stream at state, longest first"""
+        if self.dirty:
+            self.build()
+        rule, fail = self._rule, self._fail
+        node = state
+        while node:
+            if rule[node] is not None:
+                yield rule[node]
+            node = fail[node]
+
+    def depth(self, state):
+        return self._depth[state]
+
+    def extendable(self, state):
+        """True if another key could still complete a longer rule from state"""
+        if self.dirty:
+            self.build()
+        # Pruning leaves no childless branch without a rule, so any child leads to one
+        goto, fail = self._goto, self._fail
+        node = state
+        while node:
+            if goto[node]:
+                return True
+            node = fail[node]
+        return False
+
+    def is_ambiguous(self, keys):
+        """True if a rule with these keys must wait for a possible longer match"""
+        return self.extendable(self.scan_exact(keys))
+
+    def get(self, keys):
+        """Rule triggered by exactly keys, or None"""
+        return self._rule[self.scan_exact(keys)]
+
+    def scan_exact(self, keys):
+        """Trie node for keys, following goto edges only"""
+        node = 0
+        for key in keys:
+            node = self._goto[node].get(key)
+            if node is None:
+                return 0
+        return node
@@ -0,0 +1,106 @@
+# core/metrics.py
+import threading
+
+
+class Histogram:
+    """
+    Log2-bucketed latency histogram (microsecond resolution).
+    Keeps exact count/total/last/max; percentiles are bucket upper bounds.
+    """
+
+    BUCKETS = 32  # 2^31 us ~ 35 minutes; anything longer lands in the last bucket
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        index = min(int(seconds * 1e6).bit_length(), self.BUCKETS - 1) if seconds > 0 else 0
+        with self._lock:
+            self._buckets[index] += 1
+            self.count += 1
+            self.total += seconds
+            self.last = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, fraction):
+        with self._lock:
+            return self._percentile(fraction)
+
+    def _percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, n in enumerate(self._buckets):
+            seen += n
+            if seen >= target:
+                # Upper bound of the bucket, clamped to the largest value seen
+                return min((1 << index) / 1e6, self.max)
+        return self.max
+
+    def snapshot(self):
+        """Summary in seconds"""
+        with self._lock:
+            return {
+                "count": self.count,
+                "total": self.total,
+                "mean": self.total / self.count if self.count else 0.0,
+                "last": self.last,
+                "max": self.max,
+                "p50": self._percentile(0.5),
+                "p99": self._percentile(0.99),
+            }
+
+
+class Metrics:
+    """Named counters, histograms and per-rule typing histograms for the engine"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.rule_histograms = {}
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def histogram(self, name):
+        hist = self.histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(name, Histogram())
+        return hist
+
+    def observe(self, name, seconds):
+        self.histogram(name).record(seconds)
+
+    def observe_rule(self, rule_key, seconds):
+        hist = self.rule_histograms.get(rule_key)
+        if hist is None:
+            with self._lock:
+                hist = self.rule_histograms.setdefault(rule_key, Histogram())
+        hist.record(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = list(self.histograms.items())
+            rules = list(self.rule_histograms.items())
+        return {
+            "counters": counters,
+            "histograms": {name: h.snapshot() for name, h in histograms},
+            "rules": {key: h.snapshot() for key, h in rules},
+        }
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.rule_histograms.clear()
@@ -0,0 +1,100 @@
+# core/output.py
+import threading
+from collections import deque
+
+
+class OutputWorker:
+    """
+    Dedicated thread that performs typing jobs handed over by the matcher.
+
+    Jobs are served strictly in submission order from a bounded FIFO. When the
+    queue is full the backpressure policy decides what happens:
+      "block"       - the submitter waits for a free slot
+      "drop"        - the new job is discarded
+      "drop_oldest" - the oldest waiting job is discarded to make room
+
+    With threaded=False no worker thread is started and each job runs inline
+    in submit(); used with a virtual clock, where sleeping is instantaneous.
+    """
+
+    POLICIES = ("block", "drop", "drop_oldest")
+
+    def __init__(self, handler, maxsize=32, policy="block", name="macro-output", threaded=True):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown output queue policy '{policy}'")
+        self._handler = handler
+        self._jobs = deque()
+        self._cond = threading.Condition()
+        self.maxsize = maxsize
+        self.policy = policy
+        self.busy = False  # Typing a job, or about to start the next queued one
+        self.dropped = 0
+        self.max_depth = 0
+        self._threaded = threaded
+        if threaded:
+            self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+            self._thread.start()
+
+    def submit(self, *job):
+        """Queue a job; returns False if it was dropped"""
+        if not self._threaded:
+            return self._run_inline(job)
+        with self._cond:
+            if len(self._jobs) >= self.maxsize:
+                if self.policy == "drop":
+                    self.dropped += 1
+                    return False
+                if self.policy == "drop_oldest":
+                    self._jobs.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._jobs) >= self.maxsize:
+                        self._cond.wait()
+            self._jobs.append(job)
+            self.max_depth = max(self.max_depth, len(self._jobs))
+            self._cond.notify_all()
+            return True
+
+    def depth(self):
+        """Jobs waiting to be typed (not counting the one in progress)"""
+        with self._cond:
+            return len(self._jobs)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "depth": len(self._jobs),
+                "busy": self.busy,
+                "dropped": self.dropped,
+                "max_depth": self.max_depth,
+                "maxsize": self.maxsize,
+                "policy": self.policy,
+            }
+
+    def _run_inline(self, job):
+        with self._cond:
+            self.max_depth = max(self.max_depth, 1)
+            self.busy = True
+        try:
+            self._handler(*job)
+        except Exception as e:
+            print(f"Error in output worker: {e}")
+        finally:
+            self.busy = False
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs:
+                    self._cond.wait()
+                job = self._jobs.popleft()
+                self.busy = True
+                self._cond.notify_all()  # Wake blocked submitters
+            try:
+                self._handler(*job)
+            except Exception as e:
+                print(f"Error in output worker: {e}")
+            finally:
+                with self._cond:
+                    self.busy = bool(self._jobs)
@@ -0,0 +1,216 @@
+# core/parser.py
+import re
+
+GLOBAL_SECTION = "global"  # [global] switches back to the rules outside any profile
+
+# One match per line decides the format and captures every field:
+#   if <keys> { <body> } [| delays]  (body: "output, char, word, timeout" or "output | delays")
+#   (delays: "c:delay ..." pairs, optionally with an @type, @paste or @auto output mode)
+#   <keys> = <output> [| delays]
+#   <keys>: <output> [| delays]
+#   [<profile>]  (the rules below belong to profile; [global] goes back to global rules)
+_LINE = re.compile(r"""
+    (?P<comment>\#|//)
+  | \[(?P<section>[^\]=:{|]*)\]$
+  | if(?=[\s{])(?P<if_keys>[^{]*)\{(?P<body>.*)\}(?P<trailing>.*)
+  | (?P<keys>[^=:|]*)(?P<sep>[=:])(?P<output>[^|]*)(?:\|(?P<delays>.*))?
+""", re.X | re.I | re.S)
+
+# @type / @paste / @auto among the per-char delays picks the output mode
+_MODE = re.compile(r"(?<!\S)@(type|paste|auto)(?:\s*,|(?=\s|$))")
+
+_PAIR = re.compile(r"\s*(?P<char>[^\s,:=]+|.)\s*[:=]\s*(?P<delay>[^\s,]+)\s*")
+
+
+class Diagnostic:
+    """A problem found on one line; errors mean the rule was not added"""
+
+    __slots__ = ("line", "severity", "message", "text")
+
+    def __init__(self, line, severity, message, text=""):
+        self.line = line
+        self.severity = severity  # "error" or "warning"
+        self.message = message
+        self.text = text
+
+    def __repr__(self):
+        return f"Diagnostic({self.line}, {self.severity!r}, {self.message!r})"
+
+    def __str__(self):
+        return f"line {self.line}: {self.severity}: {self.message}"
+
+
+class RuleSpec:
+    """Fields for one add_rule() call, with the line it came from"""
+
+    __slots__ = ("line", "keys", "output", "timeout", "char_delay", "word_delay", "per_char_delays", "profile",
+                 "mode", "text")
+
+    def __init__(self, line, keys, output, timeout, char_delay, word_delay, per_char_delays=None, profile=None,
+                 mode="auto", text=""):
+        self.line = line
+        self.keys = keys
+        self.output = output
+        self.timeout = timeout
+        self.char_delay = char_delay
+        self.word_delay = word_delay
+        self.per_char_delays = per_char_delays
+        self.profile = profile  # None: global
+        self.mode = mode
+        self.text = text  # Source line, for diagnostics found after parsing (e.g. duplicates)
+
+    def __repr__(self):
+        return f"RuleSpec({self.line}, {'+'.join(self.keys)!r} -> {self.output!r})"
+
+
+class ParseResult:
+    """Rules parsed from a logic source plus per-line diagnostics"""
+
+    def __init__(self):
+        self.rules = []
+        self.diagnostics = []
+        self.lines = 0
+        self.added = 0  # Set by the engine once the rules are inserted
+        self.cached = False  # Engine took compiled rules from a cache instead of parsing
+        self.reused = 0  # Rules the engine kept from the previous set unchanged
+
+    @property
+    def errors(self):
+        return [d for d in self.diagnostics if d.severity == "error"]
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def error(self, line, message, text=""):
+        self.diagnostics.append(Diagnostic(line, "error", message, text))
+
+    def warning(self, line, message, text=""):
+        self.diagnostics.append(Diagnostic(line, "warning", message, text))
+
+
+def parse_char_delays(text):
+    """
+    "i:0.1, m:1.0" or "i=0.1 m=1.0" -> {"i": 0.1, "m": 1.0}.
+    Raises ValueError naming the first malformed pair.
+    """
+    delays = {}
+    pos = 0
+    end = len(text)
+    while pos < end:
+        m = _PAIR.match(text, pos)
+        if not m:
+            bad = text[pos:].strip().split(None, 1)[0].rstrip(",")
+            raise ValueError(f"bad per-char delay '{bad}' (expected char:delay)")
+        try:
+            delays[m.group("char")] = float(m.group("delay"))
+        except ValueError:
+            raise ValueError(f"bad per-char delay '{m.group(0).strip()}'") from None
+        pos = m.end()
+        if pos < end and text[pos] == ",":
+            pos += 1
+    return delays
+
+
+def _override(result, lineno, line, parts, index, name, default):
+    if index >= len(parts):
+        return default
+    try:
+        return float(parts[index])
+    except ValueError:
+        result.warning(lineno, f"invalid {name} {parts[index].strip()!r}, using default", line)
+        return default
+
+
+def parse_logic(source, default_timeout=1.0, default_char_delay=0.02, default_word_delay=0.15):
+    """
+    Parse logic text (a string, an open file or any iterable of lines) in a
+    single pass. Returns a ParseResult; nothing is added to any engine.
+    Rules before the first [profile] line (or after [global]) are global.
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    result = ParseResult()
+    rules = result.rules
+    match = _LINE.match
+    delays_cache = {}  # The same delay strings tend to repeat across a file
+    profile = None
+    lineno = 0
+    for lineno, raw in enumerate(source, 1):
+        line = raw.strip()
+        if not line:
+            continue
+        m = match(line)
+        if m is None:
+            result.warning(lineno, "unrecognized line ignored", line)
+            continue
+        comment, section, keys_text, body, trailing, keys, _, output, delays_text = m.groups()
+        if comment:
+            continue
+        if section is not None:
+            section = section.strip()
+            if not section:
+                result.error(lineno, "missing profile name", line)
+            else:
+                profile = None if section == GLOBAL_SECTION else section
+            continue
+
+        timeout, char_delay, word_delay = default_timeout, default_char_delay, default_word_delay
+        if body is not None:
+            output, bar, delays_text = body.partition("|")
+            trailing = trailing.strip()
+            if trailing.startswith("|") and not bar:
+                # if <keys> { <output>, <char>, <word>, <timeout> } | <delays>
+                delays_text = trailing[1:]
+            elif trailing:
+                result.warning(lineno, f"text after '}}' ignored: {trailing!r}", line)
+            if not bar:
+                if "," in output:
+                    # Optional positional overrides; bad numbers fall back to the default
+                    parts = output.split(",")
+                    if len(parts) > 4:
+                        # Commas inside the output: the numbers are the last three fields
+                        parts = [",".join(parts[:-3])] + parts[-3:]
+                    output = parts[0]
+                    char_delay = _override(result, lineno, line, parts, 1, "char delay", char_delay)
+                    word_delay = _override(result, lineno, line, parts, 2, "word delay", word_delay)
+                    timeout = _override(result, lineno, line, parts, 3, "timeout", timeout)
+        else:
+            keys_text = keys
+        output = output.strip()
+
+        keys = keys_text.replace("+", " ").lower().split()
+        if not keys:
+            result.error(lineno, "missing trigger keys", line)
+            continue
+        if not output:
+            result.error(lineno, "missing output", line)
+            continue
+
+        per_char_delays = None
+        mode = "auto"
+        delays_text = delays_text.strip() if delays_text else None
+        if delays_text and "@" in delays_text:
+            modes = _MODE.findall(delays_text)
+            if modes:
+                mode = modes[-1]
+                delays_text = _MODE.sub("", delays_text).strip()
+        if delays_text:
+            per_char_delays = delays_cache.get(delays_text)
+            if per_char_delays is None:
+                try:
+                    per_char_delays = delays_cache[delays_text] = parse_char_delays(delays_text)
+                except ValueError as e:
+                    result.error(lineno, str(e), line)
+                    continue
+
+        rules.append(RuleSpec(lineno, keys, output, timeout, char_delay, word_delay, per_char_delays, profile,
+                              mode, line))
+    result.lines = lineno
+    return result
+
+
+def parse_logic_file(path, default_timeout=1.0, default_char_delay=0.02, default_word_delay=0.15):
+    """parse_logic() over a file, streamed line by line"""
+    with open(path, encoding="utf-8") as f:
+        return parse_logic(f, default_timeout, default_char_delay, default_word_delay)
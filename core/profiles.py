@@ -0,0 +1,158 @@
+# core/profiles.py
+from core.matcher import SequenceMatcher
+from core.rules import RuleSet
+
+GLOBAL = None  # Profile name of the rules that are matched whatever profile is active
+
+
+def _merge(shared, own):
+    """Global rules plus a profile's own; a profile rule shadows a global one with the same keys"""
+    if not own:
+        return shared
+    own_keys = {rule.keys for rule in own}
+    return [rule for rule in shared if rule.keys not in own_keys] + list(own)
+
+
+class ProfileSet:
+    """
+    Rules partitioned into named profiles plus the global set.
+
+    Every profile is a RuleSet whose matcher is compiled over the profile's
+    own rules and the global ones, so the engine matches keystrokes against
+    one matcher and never looks at inactive profiles. Switching profiles
+    swaps that reference; nothing is recompiled. Edits keep every affected
+    matcher in step: a global rule is added to (or removed from) each
+    profile's matcher unless the profile shadows its keys.
+    """
+
+    __slots__ = ("sets",)
+
+    PATCH_LIMIT = 256  # Rules an in-place edit may touch; bigger edits rebuild a copy
+
+    def __init__(self, rules=()):
+        grouped = {GLOBAL: []}
+        for rule in rules:
+            grouped.setdefault(rule.profile, []).append(rule)
+        shared = grouped[GLOBAL]
+        self.sets = {}  # profile name -> RuleSet
+        for name, own in grouped.items():
+            matcher = SequenceMatcher()
+            matcher.rebuild(own if name is GLOBAL else _merge(shared, own))
+            self.sets[name] = RuleSet(own, matcher)
+
+    def names(self):
+        """Named profiles, sorted"""
+        return sorted(name for name in self.sets if name is not GLOBAL)
+
+    def get(self, keys, profile=GLOBAL):
+        """Rule with exactly these keys in profile (not counting global rules), or None"""
+        ruleset = self.sets.get(profile)
+        return ruleset.index.get(keys) if ruleset else None
+
+    def matcher(self, profile):
+        return self.sets[profile].matcher
+
+    def limits(self, profile):
+        """(longest timeout, most keys) over the rules matched while profile is active"""
+        sets = (self.sets[GLOBAL],) if profile is GLOBAL else (self.sets[GLOBAL], self.sets[profile])
+        timeouts = [t for ruleset in sets for t in ruleset.timeout_counts]
+        lengths = [n for ruleset in sets for n in ruleset.length_counts]
+        return (max(timeouts) if timeouts else 1.0), (max(lengths) if lengths else 1)
+
+    # -------------------------
+    # Edits in place (caller holds the engine lock); matchers stay built
+    # -------------------------
+    def patchable(self, added, removed):
+        """True if the edit is small and only touches existing profiles, so add()/remove() apply"""
+        return (len(added) + len(removed) <= self.PATCH_LIMIT
+                and all(rule.profile in self.sets for rule in added))
+
+    def patch(self, added=(), removed=()):
+        """Take removed out and put added in, in place (check patchable() first)"""
+        for rule in removed:
+            self.remove(rule)
+        for rule in added:
+            self.add(rule)
+
+    def add(self, rule):
+        own = self.sets[rule.profile]
+        own.add(rule)
+        own.matcher.insert(rule)
+        if rule.profile is GLOBAL:
+            for name, other in self.sets.items():
+                if name is not GLOBAL and rule.keys not in other.index:
+                    other.matcher.insert(rule)
+
+    def remove(self, rule):
+        own = self.sets[rule.profile]
+        own.discard(rule)
+        own.matcher.delete(rule.keys)
+        if rule.profile is GLOBAL:
+            for name, other in self.sets.items():
+                if name is not GLOBAL and rule.keys not in other.index:
+                    other.matcher.delete(rule.keys)
+        else:
+            shadowed = self.sets[GLOBAL].index.get(rule.keys)
+            if shadowed is not None:
+                own.matcher.insert(shadowed)
+
+    # -------------------------
+    # Edits on a copy (the live set is never modified)
+    # -------------------------
+    def edited(self, added=(), removed=()):
+        """
+        A new ProfileSet with removed taken out and added put in, every
+        matcher rebuilt. Profiles an edit does not touch are shared with this
+        set, the rest are copied, so the work happens off the engine lock.
+        For big edits and new profiles, where add()/remove() do not apply.
+        """
+        new = ProfileSet.__new__(ProfileSet)
+        new.sets = dict(self.sets)
+        copied = set()
+
+        def writable(name):
+            ruleset = new.sets[name]
+            if name not in copied:
+                ruleset = new.sets[name] = ruleset.copy()
+                copied.add(name)
+            return ruleset
+
+        for rule in removed:
+            own = writable(rule.profile)
+            own.discard(rule)
+            own.matcher.remove(rule.keys)
+            if rule.profile is GLOBAL:
+                for name in list(new.sets):
+                    if name is not GLOBAL and rule.keys not in new.sets[name].index:
+                        writable(name).matcher.remove(rule.keys)
+            else:
+                shadowed = new.sets[GLOBAL].index.get(rule.keys)
+                if shadowed is not None:
+                    own.matcher.add(shadowed)
+
+        for rule in added:
+            if rule.profile not in new.sets:
+                matcher = SequenceMatcher()
+                for shared in new.sets[GLOBAL].rules:
+                    matcher.add(shared)
+                new.sets[rule.profile] = RuleSet((), matcher)
+                copied.add(rule.profile)
+            own = writable(rule.profile)
+            own.add(rule)
+            own.matcher.add(rule)
+            if rule.profile is GLOBAL:
+                for name in list(new.sets):
+                    if name is not GLOBAL and rule.keys not in new.sets[name].index:
+                        writable(name).matcher.add(rule)
+
+        for name in copied:
+            matcher = new.sets[name].matcher
+            if matcher.dirty:
+                matcher.build()
+        return new
+
+    def without(self, *profiles):
+        """A new ProfileSet minus named profiles (nothing is recompiled)"""
+        new = ProfileSet.__new__(ProfileSet)
+        new.sets = {name: ruleset for name, ruleset in self.sets.items() if name not in profiles}
+        return new
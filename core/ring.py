@@ -0,0 +1,109 @@
+# core/ring.py
+
+
+class KeyRing:
+    """
+    Fixed-capacity ring buffer of (key, timestamp) pairs.
+
+    Appending to a full ring overwrites the oldest entry, and expiry pops
+    entries from the head, so per-keystroke maintenance is O(1) with no list
+    rebuilding. Index access is relative to the oldest entry, or to the newest
+    one when negative (like a list).
+    """
+
+    __slots__ = ("_keys", "_times", "_capacity", "_head", "_size")
+
+    def __init__(self, capacity=1):
+        self._capacity = max(1, capacity)
+        self._keys = [None] * self._capacity
+        self._times = [0.0] * self._capacity
+        self._head = 0
+        self._size = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def __len__(self):
+        return self._size
+
+    def _slot(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("KeyRing index out of range")
+        return (self._head + index) % self._capacity
+
+    def append(self, key, timestamp):
+        if self._size == self._capacity:
+            # Full: the new entry takes the oldest slot
+            slot = self._head
+            self._head = (self._head + 1) % self._capacity
+        else:
+            slot = (self._head + self._size) % self._capacity
+            self._size += 1
+        self._keys[slot] = key
+        self._times[slot] = timestamp
+
+    def key_at(self, index):
+        return self._keys[self._slot(index)]
+
+    def time_at(self, index):
+        return self._times[self._slot(index)]
+
+    def expire(self, cutoff):
+        """Drop entries older than cutoff from the head; returns how many"""
+        dropped = 0
+        while self._size and self._times[self._head] < cutoff:
+            self._keys[self._head] = None
+            self._head = (self._head + 1) % self._capacity
+            self._size -= 1
+            dropped += 1
+        return dropped
+
+    def clear(self):
+        for i in range(self._capacity):
+            self._keys[i] = None
+        self._head = 0
+        self._size = 0
+
+    def ends_with(self, keys):
+        """True if the newest len(keys) entries equal keys (no slicing)"""
+        n = len(keys)
+        if n > self._size:
+            return False
+        start = self._head + self._size - n
+        for i in range(n):
+            if self._keys[(start + i) % self._capacity] != keys[i]:
+                return False
+        return True
+
+    def keys(self):
+        """Keys from oldest to newest"""
+        for i in range(self._size):
+            yield self._keys[(self._head + i) % self._capacity]
+
+    def __contains__(self, key):
+        return any(k == key for k in self.keys())
+
+    def remove_all(self, key):
+        """Drop every entry with this key, keeping the order of the rest (rare path)"""
+        kept = [(k, self._times[(self._head + i) % self._capacity])
+                for i, k in enumerate(self.keys()) if k != key]
+        self.clear()
+        for k, t in kept:
+            self.append(k, t)
+
+    def resize(self, capacity):
+        """Change capacity, keeping the newest entries that still fit"""
+        capacity = max(1, capacity)
+        if capacity == self._capacity:
+            return
+        entries = [(self.key_at(i), self.time_at(i)) for i in range(self._size)][-capacity:]
+        self._capacity = capacity
+        self._keys = [None] * capacity
+        self._times = [0.0] * capacity
+        self._head = 0
+        self._size = 0
+        for k, t in entries:
+            self.append(k, t)
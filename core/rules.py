@@ -0,0 +1,166 @@
+# core/rules.py
+import sys
+
+# How an expansion reaches the target: typed as keystrokes, pasted through the
+# clipboard, or pasted when it is long and unpaced (see SmartMacroEngine.paste_threshold)
+OUTPUT_MODES = ("auto", "type", "paste")
+
+
+class Rule:
+    """
+    Compact, read-only macro rule.
+
+    Keys are stored as a tuple of interned strings with the length precomputed.
+    profile names the rule group it belongs to (None: global, always active);
+    mode is one of OUTPUT_MODES. The typing plan is compiled from the output
+    and delays on first use, so rules that never fire do not hold one.
+    Item access (rule["output"], rule.get("per_char_delays")) is kept so
+    callers that treated rules as dicts keep working.
+    """
+
+    __slots__ = ("keys", "length", "output", "timeout", "char_delay", "word_delay",
+                 "per_char_delays", "settle_delay", "_plan", "profile", "mode")
+
+    FIELDS = ("keys", "output", "timeout", "char_delay", "word_delay", "per_char_delays", "settle_delay",
+              "profile", "mode")
+
+    def __init__(self, keys, output, timeout, char_delay, word_delay, per_char_delays=None,
+                 settle_delay=None, plan=None, profile=None, mode="auto"):
+        keys = tuple(sys.intern(k) for k in keys)
+        setattr_ = object.__setattr__
+        setattr_(self, "keys", keys)
+        setattr_(self, "length", len(keys))
+        setattr_(self, "output", output)
+        setattr_(self, "timeout", timeout)
+        setattr_(self, "char_delay", char_delay)
+        setattr_(self, "word_delay", word_delay)
+        setattr_(self, "per_char_delays", per_char_delays)
+        setattr_(self, "settle_delay", settle_delay)
+        setattr_(self, "_plan", None if plan is None else tuple(plan))
+        setattr_(self, "profile", profile)
+        setattr_(self, "mode", mode)
+        # Whether a rule waits for a longer match depends on the matcher it is
+        # in (a global rule is in every profile's), so it is not stored here;
+        # see SmartMacroEngine.rule_waits()
+
+    @property
+    def plan(self):
+        """(chunk, delay_after) segments for typing the output; see compile_plan()"""
+        plan = self._plan
+        if plan is None:
+            plan = compile_plan(self.output, self.char_delay, self.word_delay, self.per_char_delays)
+            object.__setattr__(self, "_plan", plan)  # Racing threads compile the same tuple
+        return plan
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Rule is read-only (tried to set '{name}')")
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def __reduce__(self):
+        # __setattr__ is locked, so unpickling goes through the constructor
+        return (_restore_rule, (self.keys, self.output, self.timeout, self.char_delay, self.word_delay,
+                                self.per_char_delays, self.settle_delay, None, self.profile,
+                                self.mode))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def __repr__(self):
+        if self.profile is not None:
+            return f"Rule([{self.profile}] {'+'.join(self.keys)!r} -> {self.output!r})"
+        return f"Rule({'+'.join(self.keys)!r} -> {self.output!r})"
+
+
+
+class RuleSet:
+    """
+    The rules of one profile (see core/profiles.py): the keys -> rule index,
+    the profile's matcher and the counts the engine derives its limits from.
+    Small edits are made in place under the engine lock; big ones go to a
+    copy() prepared off the lock, which is then swapped in whole.
+    """
+
+    __slots__ = ("index", "matcher", "timeout_counts", "length_counts")
+
+    def __init__(self, rules, matcher):
+        self.index = {rule.keys: rule for rule in rules}
+        self.matcher = matcher
+        self.timeout_counts = {}
+        self.length_counts = {}
+        for rule in self.index.values():
+            self.timeout_counts[rule.timeout] = self.timeout_counts.get(rule.timeout, 0) + 1
+            self.length_counts[rule.length] = self.length_counts.get(rule.length, 0) + 1
+
+    @property
+    def rules(self):
+        return self.index.values()
+
+    def copy(self):
+        other = RuleSet.__new__(RuleSet)
+        other.index = dict(self.index)
+        other.matcher = self.matcher.copy()
+        other.timeout_counts = dict(self.timeout_counts)
+        other.length_counts = dict(self.length_counts)
+        return other
+
+    def add(self, rule):
+        """Add rule to the set; the matcher is left to the caller"""
+        self.index[rule.keys] = rule
+        self._count(rule, 1)
+
+    def discard(self, rule):
+        del self.index[rule.keys]
+        self._count(rule, -1)
+
+    def _count(self, rule, delta):
+        for counts, value in ((self.timeout_counts, rule.timeout), (self.length_counts, rule.length)):
+            n = counts.get(value, 0) + delta
+            if n:
+                counts[value] = n
+            else:
+                del counts[value]
+
+
+def compile_plan(output, char_delay, word_delay, per_char_delays=None):
+    """
+    (chunk, delay_after) segments for typing output, as a tuple.
+    Adjacent characters with no delay between them are merged into one write.
+    """
+    if not (per_char_delays or char_delay > 0 or word_delay > 0):
+        return ((output, 0),) if output else ()
+
+    plan = []
+    start = 0
+    last = len(output) - 1
+    for i, char in enumerate(output):
+        if i == last:
+            break
+
+        if per_char_delays and char in per_char_delays:
+            # Use per-character specific delay
+            delay = per_char_delays[char]
+        elif output[i + 1] == ' ':
+            # Use word delay before spaces
+            delay = word_delay
+        else:
+            delay = char_delay
+
+        if delay > 0:
+            plan.append((output[start:i + 1], delay))
+            start = i + 1
+    if start < len(output):
+        plan.append((output[start:], 0))
+    return tuple(plan)
+
+
+def _restore_rule(keys, output, timeout, char_delay, word_delay, per_char_delays, settle_delay, plan, profile,
+                  mode):
+    return Rule(keys, output, timeout, char_delay, word_delay, per_char_delays, settle_delay, plan, profile, mode)
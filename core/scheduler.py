@@ -0,0 +1,116 @@
+# core/scheduler.py
+import heapq
+import itertools
+import threading
+
+
+class TimerHandle:
+    """Cancellable handle for a callback queued on a Scheduler"""
+
+    __slots__ = ("deadline", "callback", "args", "cancelled", "done")
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def is_alive(self):
+        return not (self.cancelled or self.done)
+
+
+class Scheduler:
+    """
+    Heap-based timer queue served by a single worker thread.
+
+    Replaces one threading.Timer (and one OS thread) per deadline. Cancelled
+    handles stay in the heap and are skipped when they come due.
+
+    With a virtual clock no thread is started: the clock drives the queue
+    through next_deadline()/run_due() as it is advanced.
+    """
+
+    def __init__(self, clock, name="macro-scheduler"):
+        self._clock = clock
+        self._heap = []
+        self._counter = itertools.count()  # Tie-breaker keeps FIFO order for equal deadlines
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = None
+        if clock.virtual:
+            clock.attach(self)
+        else:
+            self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+            self._thread.start()
+
+    def call_later(self, delay, callback, *args):
+        handle = TimerHandle(self._clock.now() + max(0.0, delay), callback, args)
+        with self._cond:
+            heapq.heappush(self._heap, (handle.deadline, next(self._counter), handle))
+            # Only wake the worker if this is the new earliest deadline
+            if self._heap[0][2] is handle:
+                self._cond.notify()
+        return handle
+
+    def pending(self):
+        with self._cond:
+            return sum(1 for _, _, h in self._heap if h.is_alive())
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    deadline, _, handle = self._heap[0]
+                    if handle.cancelled:
+                        heapq.heappop(self._heap)
+                        continue
+                    wait = deadline - self._clock.now()
+                    if wait <= 0:
+                        heapq.heappop(self._heap)
+                        break
+                    self._cond.wait(wait)
+                if not self._running:
+                    return
+
+            self._fire(handle)
+
+    def _fire(self, handle):
+        if handle.cancelled:
+            return
+        try:
+            handle.callback(*handle.args)
+        except Exception as e:
+            print(f"Error in scheduled callback: {e}")
+        finally:
+            handle.done = True
+
+    # -------------------------
+    # Virtual clock driving
+    # -------------------------
+    def next_deadline(self):
+        with self._cond:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def run_due(self):
+        """Fire every callback whose deadline has passed, in deadline order"""
+        now = self._clock.now()
+        while True:
+            with self._cond:
+                if not self._heap or self._heap[0][0] > now:
+                    return
+                _, _, handle = heapq.heappop(self._heap)
+            self._fire(handle)
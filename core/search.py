@@ -0,0 +1,126 @@
+# core/search.py
+import threading
+from collections import defaultdict, deque
+
+
+def _keys_text(rule):
+    return "+".join(rule.keys)
+
+
+class RuleSearchIndex:
+    """
+    Search over trigger keys and output text.
+
+    A trigram -> rules map narrows substring queries to a few candidates that
+    are then checked directly. Queries whose terms are all shorter than three
+    characters match too much for postings to help and scan the texts.
+    Every whitespace-separated term must match (case-insensitive) in the
+    keys or the output.
+
+    The index is built lazily by the first search. Engine-side edits are
+    queued with add()/discard()/reset(), which never block, and applied at
+    the start of the next search under the index's own lock.
+    """
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot  # Callable returning the current rules
+        self._lock = threading.Lock()
+        self._ops = deque()
+        self._built = False
+        self._text = {}  # rule -> "keys\noutput", lowercased
+        self._grams = defaultdict(list)  # Trigram -> list of rules (may hold removed rules, see _stale)
+        self._stale = 0
+
+    # -------------------------
+    # Updates (called by the engine, under its lock)
+    # -------------------------
+    def add(self, rule):
+        self._ops.append((True, rule))
+
+    def discard(self, rule):
+        self._ops.append((False, rule))
+
+    def reset(self):
+        """The whole rule set changed; rebuild on the next search"""
+        self._ops.append((None, None))
+
+    # -------------------------
+    # Building
+    # -------------------------
+    def _apply_ops(self):
+        ops = self._ops
+        while ops:
+            op, rule = ops.popleft()
+            if op is None:
+                self._built = False
+            elif self._built:
+                (self._index if op else self._unindex)(rule)
+        if not self._built or self._stale > len(self._text):
+            self._build()
+
+    def _build(self):
+        self._text = {}
+        self._grams = defaultdict(list)
+        self._stale = 0
+        for rule in self._snapshot():
+            self._index(rule)
+        self._built = True
+
+    def _index(self, rule):
+        if rule in self._text:
+            return
+        text = f"{_keys_text(rule).lower()}\n{rule.output.lower()}"
+        self._text[rule] = text
+        grams = self._grams
+        for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+            grams[gram].append(rule)
+
+    def _unindex(self, rule):
+        if self._text.pop(rule, None) is None:
+            return
+        self._stale += 1  # Trigram postings are cleaned up by the next rebuild
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def prepare(self):
+        """Build (or catch up) the index now, e.g. before the user starts typing"""
+        with self._lock:
+            self._apply_ops()
+
+    def search(self, query):
+        """
+        Rules matching every term of query, key-prefix matches first, the
+        rest in key order. None for an empty query (no filter).
+        """
+        terms = query.lower().split()
+        if not terms:
+            return None
+        with self._lock:
+            self._apply_ops()
+            text = self._text
+            # The longest term usually has the rarest trigrams
+            longest = max(terms, key=len)
+            if len(longest) < 3:
+                # Too common for postings to narrow anything; scan every text
+                matched = [rule for rule, found in text.items() if longest in found]
+                if len(terms) > 1:
+                    matched = [rule for rule in matched if all(term in text[rule] for term in terms)]
+            else:
+                postings = [self._grams.get(longest[i:i + 3], ()) for i in range(len(longest) - 2)]
+                candidates = set(min(postings, key=len))
+                if len(terms) == 1 and len(longest) == 3:
+                    # The posting list is the answer itself
+                    matched = [rule for rule in candidates if rule in text]
+                else:
+                    matched = [rule for rule in candidates
+                               if rule in text and all(term in text[rule] for term in terms)]
+
+            matched.sort(key=text.__getitem__)
+            if len(terms) == 1:
+                # Texts start with the keys, so key-prefix matches form one sorted run; list it first
+                term = terms[0]
+                first = [rule for rule in matched if text[rule].startswith(term)]
+                if first:
+                    matched = first + [rule for rule in matched if not text[rule].startswith(term)]
+            return matched
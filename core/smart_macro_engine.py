@@ -1,44 +1,215 @@
 # core/smart_macro_engine.py
-import pyautogui
-import keyboard
+import hashlib
+import sys
 import threading
 import time
 import re
+from core.matcher import SequenceMatcher
+from core.scheduler import Scheduler
+from core.output import OutputWorker
+from core.ingest import IngestWorker
+from core.backends import KeyboardSource, PyAutoGUISink, SystemClock
+from core.metrics import Metrics
+from core.tracing import Tracer
+from core.rules import OUTPUT_MODES, Rule
+from core.profiles import GLOBAL, ProfileSet
+from core.ring import KeyRing
+from core.parser import ParseResult, parse_char_delays, parse_logic
+from core.storage import file_digest, iter_rules_file, read_cache, remove_cache, write_cache, write_rules
+from core.watcher import FileWatcher
+from core.search import RuleSearchIndex
 
 class SmartMacroEngine:
-    def __init__(self):
-        self.rules = []  # List of macros
-        self.buffer = []  # Pressed keys
-        self.buffer_time = []  # Timestamps
+    def __init__(self, output_queue_size=32, output_policy="block", settle_delay=0.05, suppress_triggers=False,
+                 key_source=None, key_sink=None, clock=None, paste_threshold=200):
+        # Backends: real keyboard hook + pyautogui + system clock unless injected
+        self.key_source = key_source or KeyboardSource()
+        self.key_sink = key_sink or PyAutoGUISink()
+        self.clock = clock or SystemClock()
+
+        self.rules = []  # List of macros, every profile
+        # Rules per profile, each profile with its own matcher; see core/profiles.py
+        self.profiles = ProfileSet()
+        self.active_profile = GLOBAL  # Global rules are always matched, plus this profile's
+        self.search_index = RuleSearchIndex(self._rules_snapshot)  # Built by the first search_rules()
+        self.settle_delay = settle_delay  # Pause after deleting trigger keys, before typing
+        # "auto" rules with unpaced outputs at least this long are pasted instead of typed
+        self.paste_threshold = paste_threshold
+        self.paste_restore_delay = 0.1  # Time the target gets to read the clipboard before it is restored
+        self.metrics = Metrics()  # Counters and latency histograms, see get_stats()
+        self.tracer = Tracer(self.clock.now)  # Opt-in span tracing, see enable_tracing()
+        self.key_seq = 0  # Sequence number of the last key-down, for trace correlation
+        # Pressed keys with timestamps; capacity tracks the longest rule
+        self.buffer = KeyRing(1)
+        self.max_timeout = 1.0  # Longest timeout of the matched rules, cached for buffer expiry
         self.lock = threading.Lock()
-        self.is_typing = False
+        # Serializes rule edits: each builds a new ProfileSet off self.lock and swaps it in
+        self.edit_lock = threading.Lock()
+        self.scheduler = Scheduler(self.clock)  # Single thread serving every engine deadline
+        # Types committed matches off the lock, in FIFO order
+        self.output = OutputWorker(self._type_output, output_queue_size, output_policy,
+                                   threaded=not self.clock.virtual)
+        # Key-downs go from the hook to a matcher thread through a lock-free queue
+        self.ingest = IngestWorker(self._ingest_batch, threaded=not self.clock.virtual)
         self.lookahead_timer = None
-        self.active_timers = []
+        self.active_timers = set()  # Pending sequence commits
         self.pending_single_keys = {}  # Track single key timers
+        self.matcher = self.profiles.matcher(GLOBAL)  # Compiled suffix index over the active rules' keys
+        self.match_state = SequenceMatcher.ROOT  # Matcher state for the current buffer
+        self.matcher_stale = False  # Rules changed since match_state was computed
+
+        # Trigger suppression: keys that are a live prefix of some rule are held
+        # back at the hook and either dropped (match) or replayed (no match)
+        self.suppress_triggers = suppress_triggers
+        self.held_keys = []  # Withheld key names, always a suffix of the key stream
+        self.suppressed_down = set()  # Keys whose key-up must be swallowed too
+        self.held_flush_timer = None
+
+        self.watcher = None  # Hot reload of a rules file, see watch_rules()
+        self.on_reload = None
 
         # Start keyboard listener
-        threading.Thread(target=self._keyboard_listener, daemon=True).start()
+        self.key_source.start(self._on_key_event, suppress=self.suppress_triggers)
 
     # -------------------------
     # Add a macro
     # -------------------------
-    def add_rule(self, keys, output, timeout=1.0, char_delay=0.02, word_delay=0.15, per_char_delays=None):
+    def add_rule(self, keys, output, timeout=1.0, char_delay=0.02, word_delay=0.15, per_char_delays=None,
+                 settle_delay=None, profile=GLOBAL, mode="auto"):
+        """
+        Add a rule to profile (GLOBAL: matched whatever profile is active).
+        mode: "type", "paste" (through the clipboard, delays ignored) or
+        "auto" (paste long outputs that have no delays).
+        """
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode '{mode}' (expected one of {', '.join(OUTPUT_MODES)})")
         keys = [k.lower() for k in keys]
-        for rule in self.rules:
-            if rule["keys"] == keys:
-                raise ValueError(f"Sequence '{'+'.join(keys)}' already exists!")
+        if self.profiles.get(tuple(keys), profile) is not None:
+            raise ValueError(f"Sequence '{'+'.join(keys)}' already exists!")
         
         # Parse per-character delays if provided
         parsed_per_char_delays = self._parse_per_char_delays(output, per_char_delays)
         
-        self.rules.append({
-            "keys": keys,
-            "output": output,
-            "timeout": timeout,
-            "char_delay": char_delay,
-            "word_delay": word_delay,
-            "per_char_delays": parsed_per_char_delays  # Store parsed delays
-        })
+        rule = Rule(keys, output, timeout, char_delay, word_delay,
+                    parsed_per_char_delays,  # Store parsed delays
+                    settle_delay,  # None = use the engine default
+                    None,  # Typing plan, compiled on the first expansion
+                    profile, mode)
+        with self.edit_lock:
+            if self.profiles.get(rule.keys, profile) is not None:
+                raise ValueError(f"Sequence '{'+'.join(keys)}' already exists!")
+            self._edit_rules(added=(rule,))
+
+    def remove_rule(self, keys, profile=GLOBAL):
+        """Remove the rule triggered by keys in profile; returns False if there is none"""
+        keys = tuple(k.lower() for k in keys)
+        with self.edit_lock:
+            rule = self.profiles.get(keys, profile)
+            if rule is None:
+                return False
+            self._edit_rules(removed=(rule,))
+        return True
+
+    def _edit_rules(self, added=(), removed=()):
+        """
+        Take removed out and put added in; caller holds self.edit_lock.
+        Small edits patch the live matchers in place under self.lock, which
+        costs the nodes they touch, not the rule count (ProfileSet.patch()).
+        Big ones, and new profiles, are applied to a copy built off the lock
+        and swapped in. Either way no keystroke meets an unbuilt matcher, and
+        buffered keys and deadlines are kept (node ids survive both).
+        """
+        rules = None
+        if len(removed) > 1:
+            gone = set(map(id, removed))
+            rules = [rule for rule in self.rules if id(rule) not in gone]
+            rules.extend(added)
+        old = None
+        if self.profiles.patchable(added, removed):
+            with self.lock:
+                self.profiles.patch(added, removed)
+                self._rules_edited_locked(rules, added, removed)
+        else:
+            profiles = self.profiles.edited(added, removed)
+            with self.lock:
+                old = self.profiles
+                self.profiles = profiles
+                self._rules_edited_locked(rules, added, removed)
+        del old  # Freed here, outside the lock
+
+    def _rules_edited_locked(self, rules, added, removed):
+        if rules is not None:
+            self.rules = rules
+        else:
+            for rule in removed:
+                self.rules.remove(rule)  # Identity hit first, no dict comparisons
+            self.rules.extend(added)
+        self.matcher = self.profiles.matcher(self.active_profile)
+        self._refresh_limits_locked()
+        self.matcher_stale = True
+        for rule in removed:
+            self.search_index.discard(rule)
+        for rule in added:
+            self.search_index.add(rule)
+
+    def _refresh_limits_locked(self):
+        """Keep the cached max timeout and buffer capacity in step with the matched rules"""
+        # Only a handful of distinct timeouts/lengths exist, so this is cheap
+        self.max_timeout, longest = self.profiles.limits(self.active_profile)
+        self.buffer.resize(longest)
+
+    def get_rule(self, keys, profile=GLOBAL):
+        """Rule of profile triggered by exactly these keys, or None"""
+        return self.profiles.get(tuple(k.lower() for k in keys), profile)
+
+    # -------------------------
+    # Profiles (see core/profiles.py)
+    # -------------------------
+    def profile_names(self):
+        """Named profiles, sorted; the global rules are not one of them"""
+        with self.lock:
+            return self.profiles.names()
+
+    def set_active_profile(self, name):
+        """
+        Match the global rules plus those of profile name (GLOBAL: global
+        rules only). Only swaps which compiled matcher keystrokes go through;
+        buffered keys and pending deadlines belong to the old profile and are
+        dropped.
+        """
+        with self.lock:
+            if name not in self.profiles.sets:
+                raise ValueError(f"Unknown profile '{name}'")
+            if name == self.active_profile:
+                return
+            self._drop_pending_locked()
+            self.active_profile = name
+            self.matcher = self.profiles.matcher(name)
+            self.match_state = SequenceMatcher.ROOT
+            self.matcher_stale = False
+            self._refresh_limits_locked()
+        self.metrics.incr("profile_switches")
+
+    def remove_profile(self, name):
+        """Remove a named profile and its rules; returns the number removed"""
+        if name is GLOBAL:
+            raise ValueError("The global rules are not a profile")
+        with self.edit_lock:
+            if name not in self.profiles.sets:
+                return 0
+            dropped = list(self.profiles.sets[name].rules)
+            profiles = self.profiles.without(name)
+            rules = [rule for rule in self.rules if rule.profile != name]
+            with self.lock:
+                if name == self.active_profile:
+                    self._drop_pending_locked()
+                    self.active_profile = GLOBAL
+                    self.match_state = SequenceMatcher.ROOT
+                old = self.profiles
+                self.profiles = profiles
+                self._rules_edited_locked(rules, (), dropped)
+        del old
+        return len(dropped)
 
     def _parse_per_char_delays(self, output, per_char_delays):
         """Parse per-character delays from various formats"""
@@ -51,37 +222,16 @@ class SmartMacroEngine:
             
         # Format 2: String like "i:0.1, m:1.0, r:0.05" or "i=0.1 m=1.0 r=0.05"
         if isinstance(per_char_delays, str):
-            delays_dict = {}
             try:
-                # Try comma-separated format: "i:0.1, m:1.0, r:0.05"
-                if ',' in per_char_delays:
-                    pairs = [pair.strip() for pair in per_char_delays.split(',')]
-                    for pair in pairs:
-                        if ':' in pair:
-                            char, delay = pair.split(':', 1)
-                            delays_dict[char.strip()] = float(delay.strip())
-                        elif '=' in pair:
-                            char, delay = pair.split('=', 1)
-                            delays_dict[char.strip()] = float(delay.strip())
-                # Try space-separated format: "i=0.1 m=1.0 r=0.05"
-                else:
-                    pairs = per_char_delays.split()
-                    for pair in pairs:
-                        if '=' in pair:
-                            char, delay = pair.split('=', 1)
-                            delays_dict[char.strip()] = float(delay.strip())
-                        elif ':' in pair:
-                            char, delay = pair.split(':', 1)
-                            delays_dict[char.strip()] = float(delay.strip())
-            except Exception as e:
+                return parse_char_delays(per_char_delays)
+            except ValueError as e:
                 print(f"Error parsing per-char delays: {e}")
                 return None
-            return delays_dict
             
         return None
 
     # -------------------------
-    # Enhanced logic parser with multiple formats + per-char delays
+    # Logic parser (see core/parser.py) + batch insert
     # -------------------------
     def add_rules_from_logic(self, logic_text, default_timeout=1.0, default_char_delay=0.02, default_word_delay=0.15):
         """
@@ -90,119 +240,242 @@ class SmartMacroEngine:
         Format 2: if <keys> { <output> | i:0.1 m:1.0 r:0.05 }
         Format 3: <keys> = <output>
         Format 4: <keys>: <output> | i=0.1 m=1.0
+        Format 1 may also carry per-char delays after the braces: if <keys> { ... } | i:0.1
+        A [name] line puts the rules below it in profile name; [global] switches back.
+        @paste, @type or @auto after the | picks the output mode: if <keys> { <long text> } | @paste
+        Returns the number of rules added; use load_logic() for diagnostics.
         """
-        lines = [l.strip() for l in logic_text.split("\n") if l.strip()]
-        rules_added = 0
-        
-        for line in lines:
-            try:
-                # Skip comment lines
-                if line.startswith("#") or line.startswith("//"):
+        result = self.load_logic(logic_text, default_timeout, default_char_delay, default_word_delay)
+        for diagnostic in result.errors:
+            print(f"Error parsing {diagnostic} - {diagnostic.text}")
+        return result.added
+
+    def load_logic(self, source, default_timeout=1.0, default_char_delay=0.02, default_word_delay=0.15,
+                   atomic=False):
+        """
+        Parse logic text, an open file or an iterable of lines and insert the
+        rules in one batch. Returns a ParseResult with per-line diagnostics
+        (duplicates included) and the number added. With atomic=True nothing
+        is added unless every line is valid.
+        """
+        result = parse_logic(source, default_timeout, default_char_delay, default_word_delay)
+        self.add_rules(result.rules, atomic, result)
+        return result
+
+    def load_logic_file(self, path, default_timeout=1.0, default_char_delay=0.02, default_word_delay=0.15,
+                        atomic=False):
+        """load_logic() over a rule file, streamed line by line"""
+        with open(path, encoding="utf-8") as f:
+            return self.load_logic(f, default_timeout, default_char_delay, default_word_delay, atomic)
+
+    def add_rules(self, specs, atomic=False, result=None):
+        """
+        Insert RuleSpecs in one edit (see _edit_rules()): big batches build
+        the matchers once, off the lock, and swap them in.
+        Rejected specs are reported as errors on result. With atomic=True
+        nothing is added if result has any error. Returns the number added.
+        """
+        if result is None:
+            result = ParseResult()
+        # Build the rules before taking the lock
+        built = self._build_rules(specs)
+
+        with self.edit_lock:
+            batch = {}
+            duplicates = False
+            for spec, rule in built:
+                key = (rule.profile, rule.keys)
+                if self.profiles.get(rule.keys, rule.profile) is not None or key in batch:
+                    result.error(spec.line, f"Sequence '{'+'.join(rule.keys)}' already exists!", spec.text)
+                    duplicates = True
                     continue
-                    
-                # Format 1 & 2: if <keys> { <output>, <char_delay>, <word_delay>, <timeout> } or with per-char delays
-                if line.lower().startswith("if") and "{" in line and "}" in line:
-                    self._parse_if_format(line, default_timeout, default_char_delay, default_word_delay)
-                    rules_added += 1
-                
-                # Format 3: <keys> = <output> with optional per-char delays
-                elif "=" in line and not line.startswith("if"):
-                    self._parse_equals_format(line, default_timeout, default_char_delay, default_word_delay)
-                    rules_added += 1
-                
-                # Format 4: <keys>: <output> with optional per-char delays
-                elif ":" in line and not line.startswith("if"):
-                    self._parse_colon_format(line, default_timeout, default_char_delay, default_word_delay)
-                    rules_added += 1
-                    
-            except Exception as e:
-                print(f"Error parsing line: {line} - {e}")
-                continue
-                
-        return rules_added
+                batch[key] = rule
+            if atomic and not result.ok:
+                batch = {}
+            if batch:
+                self._edit_rules(added=list(batch.values()))
+        if duplicates:
+            result.diagnostics.sort(key=lambda d: d.line)  # Duplicates were appended after the parse diagnostics
+        result.added = len(batch)
+        return result.added
 
-    def _parse_if_format(self, line, default_timeout, default_char_delay, default_word_delay):
-        """Parse if <keys> { <output>, <char_delay>, <word_delay>, <timeout> } format with per-char delays"""
-        try:
-            # Extract keys part
-            keys_part = line.split("if", 1)[1].split("{")[0].strip()
-            # Extract content inside braces
-            content = line.split("{", 1)[1].rsplit("}", 1)[0].strip()
-            
-            # Check if per-char delays are specified with | separator
-            per_char_delays = None
-            if "|" in content:
-                output_part, delays_part = content.split("|", 1)
-                output = output_part.strip()
-                per_char_delays = delays_part.strip()
-            else:
-                # Parse content which may contain output and parameters
-                parts = [p.strip() for p in content.split(",")]
-                output = parts[0].strip()
-            
-            # Use defaults or override with provided values
-            char_delay = default_char_delay
-            word_delay = default_word_delay
-            timeout = default_timeout
-            
-            if "|" not in content:  # Only parse traditional params if no per-char delays
-                if len(parts) > 1:
-                    try:
-                        char_delay = float(parts[1])
-                    except (ValueError, IndexError):
-                        pass
-                if len(parts) > 2:
-                    try:
-                        word_delay = float(parts[2])
-                    except (ValueError, IndexError):
-                        pass
-                if len(parts) > 3:
-                    try:
-                        timeout = float(parts[3])
-                    except (ValueError, IndexError):
-                        pass
-            
-            keys = [k.strip().lower() for k in keys_part.replace("+", " ").split()]
-            if keys and output:
-                self.add_rule(keys, output, timeout, char_delay, word_delay, per_char_delays)
-        except Exception as e:
-            print(f"Error parsing if format: {line} - {e}")
+    def _build_rules(self, specs, reuse=None, result=None):
+        """
+        (spec, Rule) for each spec. Rules in reuse (a
+        (profile, keys) -> Rule index) that the spec leaves unchanged are taken
+        as they are.
+        """
+        built = []
+        for spec in specs:
+            if reuse:
+                old = reuse.get((spec.profile, tuple(k.lower() for k in spec.keys)))
+                if (old is not None and old.output == spec.output and old.timeout == spec.timeout
+                        and old.char_delay == spec.char_delay and old.word_delay == spec.word_delay
+                        and old.per_char_delays == spec.per_char_delays and old.mode == spec.mode
+                        and old.settle_delay is None):
+                    built.append((spec, old))
+                    if result is not None:
+                        result.reused += 1
+                    continue
+            per_char_delays = self._parse_per_char_delays(spec.output, spec.per_char_delays)
+            rule = Rule([k.lower() for k in spec.keys], spec.output, spec.timeout, spec.char_delay,
+                        spec.word_delay, per_char_delays, None, None, spec.profile, spec.mode)
+            built.append((spec, rule))
+        return built
 
-    def _parse_equals_format(self, line, default_timeout, default_char_delay, default_word_delay):
-        """Parse <keys> = <output> format with optional per-char delays"""
-        try:
-            if "|" in line:
-                keys_output_part, delays_part = line.split("|", 1)
-                per_char_delays = delays_part.strip()
+    # -------------------------
+    # Rule files + compiled cache (see core/storage.py)
+    # -------------------------
+    def save_rules(self, path):
+        """
+        Stream the rules to a logic file and refresh its compiled cache.
+        Returns (rules written, rules that cannot be saved; see format_rule()).
+        """
+        rules = self.debug_rules()
+        written, skipped, digest = write_rules(path, rules, "MacroMaster-Pro rules")
+        if self.watcher and self.watcher.path == path:
+            self.watcher.refresh()  # Our own write, nothing to reload
+        for rule in skipped:
+            print(f"Error saving rule: {'+'.join(rule.keys)} - it has no logic line that loads back the same")
+        if skipped or any(rule.settle_delay is not None for rule in rules):
+            # Parsing the file would not reproduce this exact rule set
+            remove_cache(path)
+        else:
+            profiles = ProfileSet(rules)  # Private copy; the live one may change while pickling
+            self._store_cache(path, self._cache_key(digest, 1.0, 0.02, 0.15), rules, profiles, ParseResult())
+        return written, skipped
+
+    def load_rules(self, path, default_timeout=1.0, default_char_delay=0.02, default_word_delay=0.15,
+                   use_cache=True, store_cache=True):
+        """
+        Replace the loaded rules with those in a logic file.
+        If the compiled cache was built from the same file content (and
+        defaults), the compiled rules and matchers are taken from it and
+        nothing is parsed or compiled. Otherwise the file is parsed, rules
+        identical to loaded ones are kept, and only the difference is applied
+        to the live profiles (patched in place, or through a copy built off
+        the lock for big diffs; see _edit_rules()); the cache is rewritten
+        unless store_cache is False.
+        Returns a ParseResult (result.cached / result.reused tell what happened).
+        """
+        payload = None
+        if use_cache:
+            key = self._cache_key(file_digest(path), default_timeout, default_char_delay, default_word_delay)
+            payload = read_cache(path, key)
+        if payload is not None:
+            result = ParseResult()
+            result.diagnostics = payload["diagnostics"]
+            result.lines = payload["lines"]
+            result.added = len(payload["rules"])
+            result.cached = True
+            rules = list(payload["rules"])
+            with self.edit_lock, self.lock:
+                old = self._swap_rules_locked(rules, payload["profiles"])
+            del old  # Freed here, outside the lock
+            return result
+
+        # Streamed; the cache is keyed on the digest of the bytes parsed, not of the read above
+        digest = hashlib.sha256()
+        result = parse_logic(iter_rules_file(path, digest), default_timeout, default_char_delay, default_word_delay)
+        with self.edit_lock:
+            rules = {}
+            # Unchanged rules keep their Rule objects (and typing plans) and matcher entries
+            live = self.rules
+            reuse = {(rule.profile, rule.keys): rule for rule in live}
+            for spec, rule in self._build_rules(result.rules, reuse, result):
+                if (rule.profile, rule.keys) in rules:
+                    result.error(spec.line, f"Sequence '{'+'.join(rule.keys)}' already exists!", spec.text)
+                    continue
+                rules[rule.profile, rule.keys] = rule
+            del reuse
+            rules = list(rules.values())
+            kept = set(map(id, rules))
+            removed = [rule for rule in live if id(rule) not in kept]
+            kept = set(map(id, live))
+            added = [rule for rule in rules if id(rule) not in kept]
+            del kept
+            names = {rule.profile for rule in rules}
+            gone = [name for name in self.profiles.names() if name not in names]  # Sections left the file
+            if self.profiles.patchable(added, removed):
+                with self.lock:
+                    self.profiles.patch(added, removed)
+                    profiles = self.profiles.without(*gone)
+                    old = self._swap_rules_locked(rules, profiles, added, removed)
             else:
-                keys_output_part = line
-                per_char_delays = None
-                
-            keys_part, output_part = keys_output_part.split("=", 1)
-            keys = [k.strip().lower() for k in keys_part.replace("+", " ").split()]
-            output = output_part.strip()
-            if keys and output:
-                self.add_rule(keys, output, default_timeout, default_char_delay, default_word_delay, per_char_delays)
-        except Exception as e:
-            print(f"Error parsing equals format: {line} - {e}")
+                profiles = self.profiles.edited(added, removed).without(*gone)
+                with self.lock:
+                    old = self._swap_rules_locked(rules, profiles, added, removed)
+            del old  # Freed here, outside the lock
+            result.diagnostics.sort(key=lambda d: d.line)
+            result.added = len(rules)
+            if use_cache and store_cache:
+                # Under edit_lock: small edits patch these profiles in place
+                key = self._cache_key(digest.hexdigest(), default_timeout, default_char_delay, default_word_delay)
+                self._store_cache(path, key, rules, profiles, result)
+        return result
 
-    def _parse_colon_format(self, line, default_timeout, default_char_delay, default_word_delay):
-        """Parse <keys>: <output> format with optional per-char delays"""
+    def watch_rules(self, path, interval=1.0, on_reload=None):
+        """
+        Reload path through load_rules() whenever it changes on disk.
+        on_reload(result) is called from the watcher thread after each reload.
+        """
+        self.stop_watching()
+        self.on_reload = on_reload
+        self.watcher = FileWatcher(path, self._reload_rules, interval, threaded=not self.clock.virtual)
+
+    def stop_watching(self):
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+
+    def _reload_rules(self, path):
+        # A hot edit is applied as a diff; re-pickling the whole set for it
+        # would cost more than the edit. The next cold start rewrites the cache.
+        result = self.load_rules(path, store_cache=False)
+        self.metrics.incr("rule_reloads")
+        for diagnostic in result.errors:
+            print(f"Error reloading {diagnostic} - {diagnostic.text}")
+        if self.on_reload:
+            self.on_reload(result)
+
+    def _cache_key(self, digest, default_timeout, default_char_delay, default_word_delay):
+        return f"{digest}:{default_timeout!r}:{default_char_delay!r}:{default_word_delay!r}"
+
+    def _store_cache(self, path, key, rules, profiles, result):
+        payload = {"rules": rules, "profiles": profiles, "diagnostics": result.diagnostics, "lines": result.lines}
         try:
-            if "|" in line:
-                keys_output_part, delays_part = line.split("|", 1)
-                per_char_delays = delays_part.strip()
-            else:
-                keys_output_part = line
-                per_char_delays = None
-                
-            keys_part, output_part = keys_output_part.split(":", 1)
-            keys = [k.strip().lower() for k in keys_part.replace("+", " ").split()]
-            output = output_part.strip()
-            if keys and output:
-                self.add_rule(keys, output, default_timeout, default_char_delay, default_word_delay, per_char_delays)
-        except Exception as e:
-            print(f"Error parsing colon format: {line} - {e}")
+            write_cache(path, key, payload)
+        except OSError as e:
+            print(f"Error writing rules cache: {e}")
+
+    def _swap_rules_locked(self, rules, profiles, added=None, removed=None):
+        """
+        Make rules (compiled into profiles) the live rule set; caller holds
+        self.edit_lock and self.lock. Deadlines and buffered keys belong to the old set and are
+        dropped. The active profile is kept if the new set still has it.
+        added/removed: the difference from the old set, if known, so the
+        search index is patched rather than rebuilt.
+        Returns the old structures so the caller can let them go after
+        releasing the lock.
+        """
+        self._drop_pending_locked()
+        old = (self.rules, self.profiles)
+        self.rules = rules
+        self.profiles = profiles
+        if self.active_profile not in profiles.sets:
+            self.active_profile = GLOBAL
+        self.matcher = profiles.matcher(self.active_profile)
+        self._refresh_limits_locked()
+        self.match_state = SequenceMatcher.ROOT
+        self.matcher_stale = False
+        if added is None:
+            self.search_index.reset()
+        else:
+            for rule in removed:
+                self.search_index.discard(rule)
+            for rule in added:
+                self.search_index.add(rule)
+        return old
 
     # Keep the original method for backward compatibility
     def add_rules_from_if_logic(self, logic_text, default_timeout=1.0, default_char_delay=0.02, default_word_delay=0.15):
@@ -211,250 +484,460 @@ class SmartMacroEngine:
     # -------------------------
     # Keyboard listener - NO BLOCKING
     # -------------------------
-    def _keyboard_listener(self):
-        keyboard.hook(self._on_key_event)
-        keyboard.wait()
-
     def _on_key_event(self, event):
+        """Returns False to swallow the event (only honoured in suppression mode)"""
         if event.event_type != "down":
-            return
+            if self.suppressed_down:
+                with self.lock:
+                    if event.name.lower() in self.suppressed_down:
+                        self.suppressed_down.discard(event.name.lower())
+                        return False
+            return True
         if self.is_typing:
-            return
+            return True
 
-        key = event.name.lower()
-        now = time.time()
+        if self.suppress_triggers:
+            # The hook must answer pass/swallow for this very key, so match inline
+            return self._ingest_batch([(event.name, self.clock.now())])
+        # Timestamp here; everything else happens on the matcher thread
+        self.ingest.push(event.name, self.clock.now())
+        return True
 
+    def _ingest_batch(self, batch):
+        """Match a batch of (name, timestamp) key-downs under one lock hold; returns the last verdict"""
+        self.metrics.incr("key_events", len(batch))
+        verdict = True
         with self.lock:
-            self.buffer.append(key)
-            self.buffer_time.append(now)
+            lock_start = time.perf_counter()
+            for name, now in batch:
+                key = sys.intern(name.lower())  # Same objects as the interned rule keys
+                self.key_seq += 1
+                with self.tracer.span("on_key_event", key=key, seq=self.key_seq):
+                    verdict = self._ingest_key(key, name, now)
+            self.metrics.observe("lock_hold_on_key_event", time.perf_counter() - lock_start)
+        self.metrics.observe("ingest_lag", self.clock.now() - batch[0][1])
+        return verdict
+
+    def _ingest_key(self, key, name, now):
+        """Append a key-down to the buffer and (re)arm deadlines; caller holds self.lock"""
+        self.buffer.append(key, now)
+        self._advance_matcher(key)
+
+        # Cancel any pending single key timer for this key
+        if key in self.pending_single_keys:
+            timer = self.pending_single_keys[key]
+            if timer:
+                timer.cancel()
+                self.tracer.instant("timer_cancel", timer="single_key", key=key)
+            del self.pending_single_keys[key]
+
+        # Cancel previous lookahead timer
+        if self.lookahead_timer:
+            if self.lookahead_timer.is_alive():
+                self.tracer.instant("timer_cancel", timer="lookahead")
+            self.lookahead_timer.cancel()
+
+        # Start a new lookahead timer (short delay to check for longer sequences).
+        # If no longer rule can extend the buffer there is nothing to wait for.
+        lookahead = 0.05 if self.matcher.extendable(self.match_state) else 0
+        self.lookahead_timer = self.scheduler.call_later(lookahead, self._process_buffer, self.key_seq)
+        self.tracer.instant("lookahead_armed", seq=self.key_seq, delay=lookahead)
+
+        # Schedule single key timeout for immediate keys
+        self._schedule_single_key_timeout(key, now)
+
+        if self.suppress_triggers:
+            return self._hold_or_release(name)
+        return True
+
+    # -------------------------
+    # Trigger suppression
+    # -------------------------
+    def _hold_or_release(self, name):
+        """Decide whether the key just pressed is withheld from the application"""
+        was_holding = bool(self.held_keys)
+        self.held_keys.append(name)
+
+        # Only the keys forming the matcher's live prefix stay held
+        live = min(self.matcher.depth(self.match_state), len(self.held_keys))
+        if live == len(self.held_keys):
+            self.suppressed_down.add(name.lower())
+            if not was_holding:
+                self._arm_held_flush()
+            return False
 
-            # Cancel any pending single key timer for this key
-            if key in self.pending_single_keys:
-                timer = self.pending_single_keys[key]
-                if timer and timer.is_alive():
-                    timer.cancel()
-                del self.pending_single_keys[key]
+        dead = self.held_keys[:len(self.held_keys) - live]
+        self.held_keys = self.held_keys[len(self.held_keys) - live:]
+        if not was_holding:
+            # Nothing was held before and this key starts no rule: let it through
+            return True
 
-            # Cancel previous lookahead timer
-            if self.lookahead_timer and self.lookahead_timer.is_alive():
-                self.lookahead_timer.cancel()
+        # Replay the dead keys (possibly including this one) in their original order
+        self.suppressed_down.add(name.lower())
+        self._submit_output(None, 0, [], dead)
+        if self.held_keys:
+            self._arm_held_flush()
+        return False
 
-            # Start a new lookahead timer (short delay to check for longer sequences)
-            self.lookahead_timer = threading.Timer(0.05, self._process_buffer)
-            self.lookahead_timer.start()
+    def _arm_held_flush(self):
+        """Release held keys once no rule could still complete with them"""
+        if self.held_flush_timer:
+            self.held_flush_timer.cancel()
+        self.held_flush_timer = self.scheduler.call_later(self.max_timeout + 0.1, self._flush_held_keys)
 
-            # Schedule single key timeout for immediate keys
-            self._schedule_single_key_timeout(key, now)
+    def _flush_held_keys(self):
+        with self.lock:
+            if self.held_keys:
+                self._submit_output(None, 0, [], self.held_keys)
+                self.held_keys = []
+
+    def _take_held_keys(self, keys_used_count):
+        """
+        Consume held keys for a committed match of keys_used_count keys.
+        Returns (backspaces needed, held keys to replay before the output).
+        """
+        held = self.held_keys
+        if not held:
+            return keys_used_count, []
+        self.held_keys = []
+        if keys_used_count <= len(held):
+            return 0, held[:len(held) - keys_used_count]
+        return keys_used_count - len(held), []
+
+    def _advance_matcher(self, key):
+        """Carry the matcher state over to the newly appended key"""
+        if self.matcher_stale:
+            # Rules changed: replay the (short) buffer against the new index
+            self.match_state = self.matcher.scan(self.buffer.keys())
+            self.matcher_stale = False
+        else:
+            self.match_state = self.matcher.step(self.match_state, key)
+
+    def _reset_matcher(self):
+        """Recompute the matcher state after the buffer was edited"""
+        self.match_state = self.matcher.scan(self.buffer.keys())
+        self.matcher_stale = False
 
     def _schedule_single_key_timeout(self, key, press_time):
         """Schedule timeout for single key if it exists as a rule"""
-        single_key_rule = None
-        for rule in self.rules:
-            if len(rule["keys"]) == 1 and rule["keys"][0] == key:
-                single_key_rule = rule
-                break
-        
-        if single_key_rule:
+        single_key_rule = self.matcher.get((key,))
+
+        # Unambiguous single keys are committed right away by _process_buffer
+        if single_key_rule and self.matcher.is_ambiguous(single_key_rule.keys):
             # Schedule the single key to trigger after its timeout
-            timer = threading.Timer(single_key_rule["timeout"], 
-                                  self._trigger_single_key, 
-                                  args=[single_key_rule, key, press_time])
-            timer.start()
+            timer = self.scheduler.call_later(single_key_rule.timeout,
+                                              self._trigger_single_key,
+                                              single_key_rule, key, press_time)
             self.pending_single_keys[key] = timer
 
     def _trigger_single_key(self, rule, key, press_time):
         """Trigger single key output if no sequence was completed"""
-        with self.lock:
+        with self.lock, self.tracer.span("trigger_single_key", key=key) as span:
             # Check if this key is still in buffer and no sequence has used it
             if key not in self.buffer:
                 return
             
-            # Check if the key hasn't been used in any sequence
-            key_index = self.buffer.index(key)
-            current_time = time.time()
+            current_time = self.clock.now()
             
             # If key is still valid and not used in any sequence
-            if (key in self.buffer and 
-                current_time - press_time <= rule["timeout"] + 0.1):  # Small buffer
+            if current_time - press_time <= rule.timeout + 0.1:  # Small buffer
                 
                 # Remove ALL occurrences of this key from buffer to prevent duplicates
-                indices_to_remove = [i for i, k in enumerate(self.buffer) if k == key]
-                for i in sorted(indices_to_remove, reverse=True):
-                    del self.buffer[i]
-                    del self.buffer_time[i]
+                self.buffer.remove_all(key)
+                self._reset_matcher()
                 
                 # Cancel any pending timer for this key
                 if key in self.pending_single_keys:
                     del self.pending_single_keys[key]
                 
-                # Type output (will delete the trigger key and replace it)
-                self._type_output(rule, 1, [key])
+                # Hand off typing (will delete the trigger key and replace it)
+                if self.held_keys and self.held_keys[-1].lower() == key:
+                    backspaces, replay = self._take_held_keys(1)
+                else:
+                    backspaces, replay = 1, []
+                self.metrics.observe("match_to_commit", current_time - press_time)
+                span.set(committed=True)
+                self._submit_output(rule, backspaces, [key], replay)
 
     # -------------------------
     # Enhanced buffer processing with longest-match
     # -------------------------
-    def _process_buffer(self):
-        with self.lock:
-            if not self.buffer:
-                return
+    def _process_buffer(self, seq=None):
+        with self.lock, self.tracer.span("process_buffer", seq=seq):
+            lock_start = time.perf_counter()
+            self._process_buffer_locked()
+            self.metrics.observe("lock_hold_process_buffer", time.perf_counter() - lock_start)
 
-            # Clean up expired buffer entries
-            current_time = time.time()
-            max_timeout = 1.0
-            if self.rules:
-                max_timeout = max(r["timeout"] for r in self.rules)
+    def _process_buffer_locked(self):
+        if not self.buffer:
+            return
+
+        # Expire old entries from the head of the ring
+        self.buffer.expire(self.clock.now() - self.max_timeout)
+
+        if not self.buffer:
+            self.pending_single_keys.clear()
+            self.match_state = SequenceMatcher.ROOT
+            return
             
-            valid_indices = []
-            for i, t in enumerate(self.buffer_time):
-                if current_time - t <= max_timeout:
-                    valid_indices.append(i)
-
-            if not valid_indices:
-                self.buffer.clear()
-                self.buffer_time.clear()
-                self.pending_single_keys.clear()
-                return
-                
-            # Keep only valid entries
-            self.buffer = [self.buffer[i] for i in valid_indices]
-            self.buffer_time = [self.buffer_time[i] for i in valid_indices]
+        if self.matcher_stale or self.matcher.depth(self.match_state) > len(self.buffer):
+            self._reset_matcher()
 
-            # Find the longest matching sequence
-            longest_rule = None
-            max_len = 0
+        # Find the longest matching sequence: the matcher yields rules
+        # ending at the current key, longest first
+        longest_rule = None
+        max_len = 0
 
-            for rule in self.rules:
-                rule_len = len(rule["keys"])
-                if rule_len > len(self.buffer) or rule_len <= max_len:
-                    continue
-                
-                # Check if buffer ends with this rule's keys
-                if self.buffer[-rule_len:] == rule["keys"]:
-                    # Check timeout for sequence
-                    seq_start_time = self.buffer_time[-rule_len]
-                    seq_end_time = self.buffer_time[-1]
-                    if seq_end_time - seq_start_time <= rule["timeout"]:
-                        longest_rule = rule
-                        max_len = rule_len
-
-            if longest_rule:
-                # CANCEL ALL single key timers for keys in the sequence
-                for key in longest_rule["keys"]:
-                    if key in self.pending_single_keys:
-                        timer = self.pending_single_keys[key]
-                        if timer and timer.is_alive():
-                            timer.cancel()
-                        del self.pending_single_keys[key]
-
-                # Calculate remaining wait time
-                seq_start_time = self.buffer_time[-max_len]
-                remaining_wait = max(0, longest_rule["timeout"] - (time.time() - seq_start_time))
-                
-                # Start delayed typing - but don't remove buffer yet
-                timer = threading.Timer(remaining_wait, self._execute_sequence, args=[longest_rule, max_len])
-                timer.start()
-                self.active_timers.append(timer)
+        for rule in self.matcher.matches(self.match_state):
+            rule_len = rule.length
+            # Check timeout for sequence
+            seq_start_time = self.buffer.time_at(-rule_len)
+            seq_end_time = self.buffer.time_at(-1)
+            if seq_end_time - seq_start_time <= rule.timeout:
+                longest_rule = rule
+                max_len = rule_len
+                break
 
-    def _execute_sequence(self, rule, keys_used_count):
+        if longest_rule:
+            # CANCEL ALL single key timers for keys in the sequence
+            for key in longest_rule.keys:
+                if key in self.pending_single_keys:
+                    timer = self.pending_single_keys[key]
+                    if timer:
+                        timer.cancel()
+                    del self.pending_single_keys[key]
+
+            # Calculate remaining wait time; only ambiguous prefixes pay it
+            remaining_wait = 0
+            if self.matcher.extendable(self.match_state):
+                seq_start_time = self.buffer.time_at(-max_len)
+                remaining_wait = max(0, longest_rule.timeout - (self.clock.now() - seq_start_time))
+            
+            # Start delayed typing - but don't remove buffer yet
+            self.active_timers = {t for t in self.active_timers if t.is_alive()}
+            timer = self.scheduler.call_later(remaining_wait, self._execute_sequence, longest_rule, max_len,
+                                              self.clock.now())
+            self.active_timers.add(timer)
+            self.tracer.instant("match", keys="+".join(longest_rule.keys), wait=remaining_wait)
+
+    def _execute_sequence(self, rule, keys_used_count, matched_at=None):
         """Execute sequence and clean up buffer"""
-        with self.lock:
+        with self.lock, self.tracer.span("execute_sequence", keys="+".join(rule.keys)) as span:
             # Double-check that the sequence still exists in buffer
             if len(self.buffer) >= keys_used_count:
-                expected_sequence = rule["keys"]
-                actual_sequence = self.buffer[-keys_used_count:]
-                
-                if actual_sequence == expected_sequence:
+                if self.buffer.ends_with(rule.keys):
                     # COMPLETELY CLEAR THE BUFFER to prevent partial matches
                     self.buffer.clear()
-                    self.buffer_time.clear()
                     self.pending_single_keys.clear()
+                    self.match_state = SequenceMatcher.ROOT
                     
-                    # Type output (will delete the trigger keys and replace them)
-                    self._type_output(rule, keys_used_count, rule["keys"])
+                    # Hand off typing (will delete the trigger keys and replace them)
+                    backspaces, replay = self._take_held_keys(keys_used_count)
+                    if matched_at is not None:
+                        self.metrics.observe("match_to_commit", self.clock.now() - matched_at)
+                    span.set(committed=True)
+                    self._submit_output(rule, backspaces, rule.keys, replay)
 
     # -------------------------
     # PERFECT TYPING OUTPUT - DELETE TRIGGER KEYS ONLY
+    # Runs on the output worker thread, never under self.lock
     # -------------------------
-    def _type_output(self, rule, keys_used_count, keys_to_suppress):
-        if self.is_typing:
-            # If already typing, schedule this for later
-            threading.Timer(0.1, self._type_output, args=[rule, keys_used_count, keys_to_suppress]).start()
-            return
-            
-        self.is_typing = True
-        
+    @property
+    def is_typing(self):
+        return self.output.busy
+
+    def _submit_output(self, rule, keys_used_count, keys_to_suppress, replay=()):
+        """Queue a typing (or replay-only) job, stamped for queue-wait metrics"""
+        self.metrics.incr("expansions" if rule is not None else "replays")
+        if not self.output.submit(rule, keys_used_count, keys_to_suppress, replay, self.clock.now()):
+            self.metrics.incr("output_dropped")
+            self.tracer.instant("output_dropped")
+
+    def _type_output(self, rule, keys_used_count, keys_to_suppress, replay=(), enqueued_at=None):
+        if enqueued_at is not None:
+            self.metrics.observe("queue_wait", self.clock.now() - enqueued_at)
+            self.tracer.complete("queue_wait", enqueued_at, self.clock.now() - enqueued_at)
+        name = "+".join(rule.keys) if rule is not None else None
+        with self.tracer.span("type_output", keys=name, replay=len(replay)):
+            self._type_output_traced(rule, keys_used_count, replay)
+
+    def _type_output_traced(self, rule, keys_used_count, replay):
         try:
-            # Delete ONLY the trigger keys (not blocking, just backspacing)
-            for _ in range(keys_used_count):
-                pyautogui.press('backspace')
-                time.sleep(0.01)  # Small delay between backspaces
-            
-            # Wait for backspaces to complete
-            time.sleep(0.05)
-            
-            output = rule["output"]
-            char_delay = rule["char_delay"]
-            word_delay = rule["word_delay"]
-            per_char_delays = rule.get("per_char_delays")
+            # Replay withheld keys that did not end up part of this match
+            for name in replay:
+                self.key_sink.press(name)
+            if rule is None:
+                return
+
+            # Delete ONLY the trigger keys in one batched call
+            deletion_start = self.clock.now()
+            if keys_used_count:
+                self.key_sink.press('backspace', presses=keys_used_count)
+
+                # Let the target application process the backspaces
+                settle_delay = rule.settle_delay
+                if settle_delay is None:
+                    settle_delay = self.settle_delay
+                if settle_delay > 0:
+                    self.clock.sleep_until(deletion_start + settle_delay)
+            self.metrics.observe("deletion", self.clock.now() - deletion_start)
+            self.tracer.complete("deletion", deletion_start, self.clock.now() - deletion_start,
+                                 backspaces=keys_used_count)
             
-            # Type the output with delays if needed
-            if per_char_delays or char_delay > 0 or word_delay > 0:
-                # Type with custom delays
-                for i, char in enumerate(output):
-                    pyautogui.write(char)
-                    
-                    # Calculate delay for this character
-                    current_delay = char_delay  # Default delay
-                    
-                    if per_char_delays and char in per_char_delays:
-                        # Use per-character specific delay
-                        current_delay = per_char_delays[char]
-                    elif i < len(output) - 1 and output[i+1] == ' ':
-                        # Use word delay before spaces
-                        current_delay = word_delay
-                    
-                    # Apply delay if not the last character
-                    if i < len(output) - 1:
-                        time.sleep(current_delay)
+            typing_start = deadline = self.clock.now()
+            if self._pastes(rule) and self._paste_text(rule.output):
+                self.metrics.incr("pastes")
             else:
-                # Type instantly if no delays are specified
-                pyautogui.write(output, interval=0)
+                # Type the plan (see Rule.plan): one write per run of undelayed characters.
+                # Delays are absolute deadlines from the start, so time spent inside
+                # write() and oversleeping are absorbed instead of accumulating.
+                for chunk, delay in rule.plan:
+                    self.key_sink.write(chunk)
+                    if delay:
+                        deadline += delay
+                        self.clock.sleep_until(deadline)
+            typing_time = self.clock.now() - typing_start
+            self.metrics.observe("typing", typing_time)
+            self.tracer.complete("typing", typing_start, typing_time, segments=len(rule.plan))
+            self.metrics.observe_rule("+".join(rule.keys), typing_time)
                         
         except Exception as e:
             print(f"Error typing output: {e}")
-        finally:
-            self.is_typing = False
+
+    def _pastes(self, rule):
+        """True if rule's output goes through the clipboard rather than keystrokes"""
+        if rule.mode == "auto":
+            # Only unpaced outputs: a paste cannot honour per-character delays
+            return len(rule.output) >= self.paste_threshold and len(rule.plan) == 1 and not rule.plan[0][1]
+        return rule.mode == "paste"
+
+    def _paste_text(self, text):
+        """
+        Paste text through the clipboard in constant time whatever its length,
+        then put the previous clipboard text back (non-text content is lost).
+        Returns False if the clipboard could not be used; the trigger keys are
+        already deleted by then, so the caller types the output instead.
+        """
+        sink = self.key_sink
+        saved = None
+        try:
+            saved = sink.get_clipboard()
+            sink.set_clipboard(text)
+            sink.paste()
+        except Exception as e:
+            print(f"Error pasting output, typing it instead: {e}")
+            self.metrics.incr("paste_failures")
+            pasted = False
+        else:
+            pasted = True
+            # The target reads the clipboard after the shortcut arrives, not during it
+            self.clock.sleep(self.paste_restore_delay)
+        if saved is not None:
+            try:
+                sink.set_clipboard(saved)
+            except Exception as e:
+                print(f"Error restoring clipboard: {e}")
+        return pasted
 
     # -------------------------
     # Utilities
     # -------------------------
     def clear_rules(self):
-        with self.lock:
-            # Cancel all active timers
-            for timer in self.active_timers:
-                if timer and timer.is_alive():
-                    timer.cancel()
-            self.active_timers.clear()
-            
-            # Cancel all pending single key timers
-            for key, timer in list(self.pending_single_keys.items()):
-                if timer and timer.is_alive():
-                    timer.cancel()
-            self.pending_single_keys.clear()
-            
-            self.rules.clear()
-            self.buffer.clear()
-            self.buffer_time.clear()
+        with self.edit_lock, self.lock:
+            old = self._swap_rules_locked([], ProfileSet())
+        del old
+
+    def _drop_pending_locked(self):
+        """Cancel pending deadlines and forget buffered keys; caller holds self.lock"""
+        # Cancel all active timers
+        for timer in self.active_timers:
+            timer.cancel()
+        self.active_timers.clear()
+        
+        # Cancel all pending single key timers
+        for key, timer in list(self.pending_single_keys.items()):
+            if timer:
+                timer.cancel()
+        self.pending_single_keys.clear()
+        
+        # Nothing can match any more: release withheld keys
+        if self.held_keys:
+            self._submit_output(None, 0, [], self.held_keys)
+            self.held_keys = []
+
+        self.buffer.clear()
 
     def debug_rules(self):
-        return [{
-            "keys": r["keys"],
-            "output": r["output"],
-            "timeout": r["timeout"],
-            "char_delay": r["char_delay"],
-            "word_delay": r["word_delay"],
-            "per_char_delays": r.get("per_char_delays", {})
-        } for r in self.rules]
+        """
+        Read-only snapshot of the loaded rules (Rule objects, not copies).
+        rule_waits() tells whether a rule waits for a possible longer match.
+        """
+        with self.lock:
+            return tuple(self.rules)
+
+    def rule_waits(self, rule):
+        """
+        True if rule, as matched under the active profile, waits out its
+        timeout in case a longer rule follows. False for rules that are not
+        matched at all (another profile's, or a global rule the profile shadows).
+        """
+        with self.lock:
+            matcher = self.matcher
+            return matcher.get(rule.keys) is rule and matcher.is_ambiguous(rule.keys)
+
+    def _rules_snapshot(self):
+        with self.lock:
+            return tuple(self.rules)
+
+    def search_rules(self, query):
+        """
+        Rules whose keys or output contain every term of query (see
+        core/search.py); all rules for an empty query. Safe to call off the
+        UI thread; never holds the engine lock for longer than a snapshot.
+        """
+        found = self.search_index.search(query)
+        return self._rules_snapshot() if found is None else found
 
     def get_rules_count(self):
-        return len(self.rules)
\ No newline at end of file
+        return len(self.rules)
+
+    def get_deletion_stats(self):
+        """Count, total, mean, last, max and percentiles of trigger deletion time (seconds)"""
+        return self.metrics.histogram("deletion").snapshot()
+
+    def get_stats(self):
+        """
+        Snapshot of engine instrumentation (all durations in seconds):
+          counters   - key_events, expansions, replays, pastes, paste_failures, output_dropped,
+                       rule_reloads, profile_switches
+          histograms - ingest_lag (hook to matcher), lock_hold_on_key_event, lock_hold_process_buffer,
+                       match_to_commit, queue_wait, deletion, typing
+          rules      - typing duration per rule, keyed by "k1+k2"
+          output_queue - see get_output_queue_stats()
+          ingest     - matcher-thread queue depth, batches and largest batch
+          active_profile - name of the profile being matched (None: global rules only)
+        """
+        stats = self.metrics.snapshot()
+        stats["output_queue"] = self.output.stats()
+        stats["ingest"] = self.ingest.stats()
+        stats["rules_count"] = len(self.rules)
+        stats["active_profile"] = self.active_profile
+        return stats
+
+    def reset_stats(self):
+        self.metrics.reset()
+
+    def enable_tracing(self, capacity=None):
+        """Start recording trace events into the ring buffer"""
+        self.tracer.enable(capacity)
+
+    def disable_tracing(self):
+        self.tracer.disable()
+
+    def dump_trace(self, path):
+        """Write recorded events as Chrome trace-event JSON (chrome://tracing, Perfetto)"""
+        self.tracer.dump_chrome_trace(path)
+
+    def get_output_queue_stats(self):
+        """Depth, drops and policy of the typing queue"""
+        return self.output.stats()
\ No newline at end of file
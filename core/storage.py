@@ -0,0 +1,198 @@
+# core/storage.py
+import gc
+import hashlib
+import mmap
+import os
+import pickle
+
+from core.parser import GLOBAL_SECTION, parse_logic
+
+DEFAULT_RULES_PATH = os.path.join(os.path.expanduser("~"), ".macromaster_rules.txt")
+# Compiled caches live here, never next to the rule files: a rule file may come
+# from anywhere, and a cache is unpickled (which can run code)
+CACHE_DIR = os.path.join(os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+                         or os.path.join(os.path.expanduser("~"), ".cache"), "macromaster")
+CACHE_MAGIC = b"MACROCACHE5"  # Bump when the pickled engine state changes shape
+
+_UNSAVEABLE = ("|", "\n", "\r")
+
+
+# -------------------------
+# Rule files (logic format, one rule per line)
+# -------------------------
+def format_rule(rule):
+    """
+    One logic line that parses back to the same rule:
+    if <keys> { <output>, <char_delay>, <word_delay>, <timeout> } [| @mode c:delay ...]
+    Raises ValueError if the rule cannot be written on one line, or if the
+    line would load back as anything else (keys like "{" or "+", per-char
+    delays on " " or ",": the format has no escapes).
+    """
+    output = rule.output
+    if any(c in output for c in _UNSAVEABLE) or output != output.strip():
+        raise ValueError(f"output of '{'+'.join(rule.keys)}' cannot be saved as a logic line")
+    line = f"if {'+'.join(rule.keys)} {{ {output}, {rule.char_delay}, {rule.word_delay}, {rule.timeout} }}"
+    extras = [f"@{rule.mode}"] if rule.mode != "auto" else []
+    if rule.per_char_delays:
+        extras.extend(f"{c}:{d}" for c, d in rule.per_char_delays.items())
+    if extras:
+        line += " | " + " ".join(extras)
+    if not _parses_back(rule, line):
+        raise ValueError(f"'{'+'.join(rule.keys)}' would not load back from a logic line as the same rule")
+    return line
+
+
+def _parses_back(rule, line):
+    parsed = parse_logic((line,)).rules
+    if len(parsed) != 1:
+        return False
+    spec = parsed[0]
+    return (tuple(spec.keys) == rule.keys and spec.output == rule.output and spec.timeout == rule.timeout
+            and spec.char_delay == rule.char_delay and spec.word_delay == rule.word_delay
+            and (spec.per_char_delays or None) == (rule.per_char_delays or None) and spec.mode == rule.mode)
+
+
+def format_section(profile):
+    """[profile] header line; raises ValueError if the name would not parse back"""
+    if (profile == GLOBAL_SECTION or profile != profile.strip() or not profile
+            or any(c in profile for c in "]=:{|\n\r")):
+        raise ValueError(f"profile name {profile!r} cannot be saved as a section")
+    return f"[{profile}]"
+
+
+def iter_logic_lines(rules, skipped=None):
+    """
+    Logic lines for rules, lazily: global rules first, then each profile
+    under its [name] header. Unsaveable rules are appended to skipped.
+    """
+    groups = {None: []}
+    for rule in rules:
+        groups.setdefault(rule.profile, []).append(rule)
+    for profile, group in groups.items():
+        if profile is not None:
+            try:
+                yield format_section(profile)
+            except ValueError:
+                if skipped is not None:
+                    skipped.extend(group)
+                continue
+        for rule in group:
+            try:
+                yield format_rule(rule)
+            except ValueError:
+                if skipped is not None:
+                    skipped.append(rule)
+
+
+def write_rules(path, rules, header=None):
+    """
+    Stream rules to path one line at a time. The file is replaced atomically,
+    so a crash never leaves a half-written rule file. Returns
+    (rules written, skipped rules, sha256 of the bytes written).
+    """
+    skipped = []
+    written = 0
+    digest = hashlib.sha256()
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        if header:
+            data = f"# {header}\n".encode("utf-8")
+            f.write(data)
+            digest.update(data)
+        for line in iter_logic_lines(rules, skipped):
+            data = f"{line}\n".encode("utf-8")
+            f.write(data)
+            digest.update(data)
+            if line[0] != "[":  # Rule lines start with "if", headers with "["
+                written += 1
+    os.replace(tmp, path)
+    return written, skipped, digest.hexdigest()
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_rules_file(path, digest):
+    """
+    A rule file's lines, decoded one at a time, with every byte fed to digest
+    (a hashlib object) as it is read: once the lines are consumed, digest
+    describes exactly the text that was parsed.
+    """
+    with open(path, "rb") as f:
+        for raw in f:
+            digest.update(raw)
+            yield raw.decode("utf-8")
+
+
+# -------------------------
+# Compiled-state cache (per-user, in CACHE_DIR)
+# -------------------------
+def cache_path(path):
+    """Cache file of the rule file at path: named after its absolute path, private to this user"""
+    name = hashlib.sha256(os.path.abspath(path).encode("utf-8", "surrogateescape")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{name[:32]}.cache")
+
+
+def _owned(f):
+    """True if f was written by this user and nobody else can write it"""
+    if not hasattr(os, "getuid"):
+        return True  # Windows: CACHE_DIR is under the user's own profile
+    st = os.fstat(f.fileno())
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+def _cache_header(key):
+    return CACHE_MAGIC + b" " + key.encode("ascii") + b"\n"
+
+
+def write_cache(path, key, payload):
+    """Pickle payload to the cache of path, tagged with key (see read_cache)"""
+    os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+    target = cache_path(path)
+    tmp = f"{target}.tmp"
+    with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+        f.write(_cache_header(key))
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, target)
+
+
+def read_cache(path, key):
+    """
+    Payload from the cache of path if it was written for key, else None.
+    The file is mapped rather than read; its owner and header are checked
+    before anything is unpickled.
+    """
+    target = cache_path(path)
+    header = _cache_header(key)
+    try:
+        with open(target, "rb") as f:
+            if not _owned(f):
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:len(header)] != header:
+                    return None
+                with memoryview(mm) as view, view[len(header):] as body:
+                    # Unpickling allocates only acyclic objects; collector passes would just slow it down
+                    gc_was_enabled = gc.isenabled()
+                    gc.disable()
+                    try:
+                        return pickle.loads(body)
+                    finally:
+                        if gc_was_enabled:
+                            gc.enable()
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        # Missing, empty (mmap of 0 bytes), truncated or written by other code
+        return None
+
+
+def remove_cache(path):
+    try:
+        os.remove(cache_path(path))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,127 @@
+# core/tracing.py
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def set(self, **args):
+        """Attach arguments discovered while the span is open"""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = self.tracer.now()
+        return self
+
+    def __exit__(self, *exc):
+        end = self.tracer.now()
+        self.tracer._record("X", self.name, self.start, end - self.start, self.args)
+        return False
+
+
+class _NullSpan:
+    """Shared no-op span handed out while tracing is disabled"""
+
+    __slots__ = ()
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Opt-in event tracer with a fixed-size ring buffer.
+
+    Records complete spans ("X") and instant events ("i") with the calling
+    thread, and exports them as Chrome trace-event JSON (chrome://tracing,
+    Perfetto) or JSON lines. While disabled, span() returns a shared no-op
+    object and instant() returns immediately.
+    """
+
+    def __init__(self, clock=time.perf_counter, capacity=100000, enabled=False):
+        self.now = clock
+        self.enabled = enabled
+        self._events = deque(maxlen=capacity)
+        self._threads = {}  # ident -> name, for trace metadata
+
+    def enable(self, capacity=None):
+        if capacity and capacity != self._events.maxlen:
+            self._events = deque(self._events, maxlen=capacity)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self._events.clear()
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, args)
+
+    def instant(self, name, **args):
+        if not self.enabled:
+            return
+        self._record("i", name, self.now(), 0.0, args)
+
+    def complete(self, name, start, duration, **args):
+        """Record a span whose timing was measured by the caller"""
+        if not self.enabled:
+            return
+        self._record("X", name, start, duration, args)
+
+    def _record(self, phase, name, start, duration, args):
+        ident = threading.get_ident()
+        if ident not in self._threads:
+            self._threads[ident] = threading.current_thread().name
+        # deque.append with maxlen is atomic and drops the oldest event
+        self._events.append((phase, name, start, duration, ident, args))
+
+    def events(self):
+        return list(self._events)
+
+    # -------------------------
+    # Export
+    # -------------------------
+    def to_chrome_trace(self):
+        pid = os.getpid()
+        trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": ident, "args": {"name": name}}
+                 for ident, name in list(self._threads.items())]
+        for phase, name, start, duration, ident, args in self.events():
+            event = {"name": name, "ph": phase, "ts": start * 1e6, "pid": pid, "tid": ident, "args": args}
+            if phase == "X":
+                event["dur"] = duration * 1e6
+            else:
+                event["s"] = "t"
+            trace.append(event)
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def dump_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+
+    def dump_jsonl(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for phase, name, start, duration, ident, args in self.events():
+                f.write(json.dumps({"ph": phase, "name": name, "ts": start, "dur": duration,
+                                    "thread": self._threads.get(ident, ident), "args": args},
+                                   default=str) + "\n")
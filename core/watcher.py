@@ -0,0 +1,65 @@
+# core/watcher.py
+import os
+import threading
+
+
+class FileWatcher:
+    """
+    Polls a file's size and mtime and calls callback(path) once a change has
+    settled (the same stat seen on two polls in a row), so a file caught
+    half-written by an editor is not picked up.
+
+    Runs on its own daemon thread; callbacks may take a while (a full reload)
+    without delaying the engine's deadlines. With threaded=False nothing is
+    started and the owner calls poll() itself.
+    """
+
+    def __init__(self, path, callback, interval=1.0, name="macro-watcher", threaded=True):
+        self.path = path
+        self._callback = callback
+        self.interval = interval
+        self._seen = self._stat()
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread = None
+        if threaded:
+            self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+            self._thread.start()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None  # Missing (e.g. mid-rename); reported as a change once it settles back
+        return st.st_mtime_ns, st.st_size
+
+    def refresh(self):
+        """Accept the file as it is now (after writing it ourselves)"""
+        self._seen = self._stat()
+        self._pending = None
+
+    def poll(self):
+        """Check once; returns True if the callback ran"""
+        current = self._stat()
+        if current == self._seen:
+            self._pending = None
+            return False
+        if current != self._pending:
+            self._pending = current  # Changed since last poll: wait for it to settle
+            return False
+        self._seen = current
+        self._pending = None
+        if current is None:
+            return False
+        try:
+            self._callback(self.path)
+        except Exception as e:
+            print(f"Error reloading {self.path}: {e}")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
@@ -1,9 +1,63 @@
 # main.py
-from ui.interface import MacroUI
+"""
+MacroMaster-Pro.
 
-def main():
-    app = MacroUI()
+    python main.py [rules.txt]                 GUI (customtkinter)
+    python main.py --headless [rules.txt]      engine only, no Tk
+    python main.py --check [rules.txt]         validate a rules file and exit
+
+GUI and input libraries are imported only by the mode that needs them.
+--timings reports import and startup time on stderr.
+"""
+import argparse
+import sys
+import time
+
+STARTED = time.perf_counter()
+
+
+def report_timings(mode, imported, ready):
+    print(f"{mode} startup: imports {(imported - STARTED) * 1000:.1f} ms, "
+          f"ready {(ready - STARTED) * 1000:.1f} ms", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MacroMaster-Pro text expander")
+    parser.add_argument("rules", nargs="?", help="Rules file (default: ~/.macromaster_rules.txt)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--headless", action="store_true", help="Run the engine without the GUI")
+    mode.add_argument("--check", action="store_true", help="Validate the rules file and exit")
+    parser.add_argument("--profile", help="Active rule profile (headless)")
+    parser.add_argument("--no-watch", action="store_true", help="Do not reload the rules file on edits (headless)")
+    parser.add_argument("--suppress", action="store_true", help="Hold back trigger keys at the hook (headless)")
+    parser.add_argument("--timings", action="store_true", help="Report import and startup time")
+    args = parser.parse_args(argv)
+
+    from core.storage import DEFAULT_RULES_PATH
+    path = args.rules or DEFAULT_RULES_PATH
+
+    if args.check:
+        from core.daemon import check_rules
+        imported = time.perf_counter()
+        code = check_rules(path)
+        if args.timings:
+            report_timings("check", imported, time.perf_counter())
+        return code
+
+    if args.headless:
+        from core.daemon import run_daemon
+        imported = time.perf_counter()
+        on_ready = (lambda engine: report_timings("headless", imported, time.perf_counter())) if args.timings else None
+        return run_daemon(path, args.profile, not args.no_watch, on_ready, suppress_triggers=args.suppress)
+
+    from ui.interface import MacroUI  # Only the GUI needs customtkinter and tkinter
+    imported = time.perf_counter()
+    app = MacroUI(path)
+    if args.timings:
+        report_timings("gui", imported, time.perf_counter())
     app.run()
+    return 0
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -1,13 +1,19 @@
 # ui/interface.py
 import customtkinter as ctk
 from core.smart_macro_engine import SmartMacroEngine
+from core.rules import OUTPUT_MODES
+from core.storage import DEFAULT_RULES_PATH, iter_logic_lines
+from ui.rule_table import RuleTable
+import os
 import threading
-import tkinter as tk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
+
+SEARCH_DEBOUNCE_MS = 150  # Quiet time after the last keystroke before searching
+NO_PROFILE = "(global only)"  # Profile menu entry for matching the global rules alone
 
 
 class MacroUI:
-    def __init__(self):
+    def __init__(self, rules_path=DEFAULT_RULES_PATH):
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("green")
 
@@ -21,37 +27,18 @@ class MacroUI:
         self.header = ctk.CTkLabel(self.window, text="MacroMaster-Pro | Code by Imran", font=("Arial", 24, "bold"))
         self.header.pack(pady=12)
 
-        # Table frame with scrollbar
-        self.table_container = ctk.CTkFrame(self.window)
-        self.table_container.pack(padx=12, pady=6, fill="both", expand=True)
-
-        # Create canvas and scrollbar for table
-        self.canvas = tk.Canvas(self.table_container, bg='#2b2b2b', highlightthickness=0)
-        self.scrollbar = ctk.CTkScrollbar(self.table_container, orientation="vertical", command=self.canvas.yview)
-        self.scrollable_frame = ctk.CTkFrame(self.canvas)
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
-
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-
-        self.canvas.pack(side="left", fill="both", expand=True, padx=(0, 5))
-        self.scrollbar.pack(side="right", fill="y")
+        # Search box: filters the table through the engine's search index
+        self.search_entry = ctk.CTkEntry(self.window, placeholder_text="Search keys or output...", width=400)
+        self.search_entry.pack(padx=12, pady=(6, 0), anchor="w")
+        self.search_entry.bind("<KeyRelease>", self._on_search_key)
+        self.search_entry.bind("<FocusIn>", self._warm_search)
+        self.search_query = ""
+        self.search_job = None
+        self.search_generation = 0  # Results of older queries are dropped
 
-        # Bind mousewheel to canvas
-        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
-
-        # Table headers - ADDED PER-CHAR DELAYS COLUMN
-        headers = ["Keys / Sequence", "Output", "Timeout", "CharDelay", "WordDelay", "Per-Char Delays", "Delete"]
-        for i, h in enumerate(headers):
-            ctk.CTkLabel(self.scrollable_frame, text=h, font=("Arial", 12, "bold")).grid(
-                row=0, column=i, padx=6, pady=6, sticky="ew"
-            )
-
-        self.row_widgets = []
+        # Virtualized rule table: widgets only for the rows on screen
+        self.table = RuleTable(self.window, on_delete=self._delete_rule_by_repr, waits=self.engine.rule_waits)
+        self.table.pack(padx=12, pady=6, fill="both", expand=True)
 
         # Input area
         self.add_frame = ctk.CTkFrame(self.window)
@@ -80,8 +67,12 @@ class MacroUI:
         self.per_char_delays_entry = ctk.CTkEntry(self.add_frame, placeholder_text="Per-Char Delays (i:0.1 m:1.0)", width=200)
         self.per_char_delays_entry.grid(row=0, column=5, padx=6)
 
+        # Typed, pasted through the clipboard, or pasted when long and unpaced
+        self.mode_menu = ctk.CTkOptionMenu(self.add_frame, values=list(OUTPUT_MODES), width=90)
+        self.mode_menu.grid(row=0, column=6, padx=6)
+
         self.add_btn = ctk.CTkButton(self.add_frame, text="Add Rule", command=self.add_rule_from_inputs)
-        self.add_btn.grid(row=0, column=6, padx=6)
+        self.add_btn.grid(row=0, column=7, padx=6)
 
         # Separator
         self.sep = ctk.CTkLabel(self.window, text="— OR — Bulk Import Using Logic Syntax —", font=("Arial", 12))
@@ -104,7 +95,12 @@ class MacroUI:
             "# NEW: Per-character delays using | separator:\n"
             "if t { test | t:0.5 e:1.0 s:0.2 }\n"
             "i = imran | i:0.1 m:1.0 r:0.05 a:0.2 n:0.3\n"
-            "b+c = khan | k:0.5 h:0.1 a:2.0 n:0.05"
+            "b+c = khan | k:0.5 h:0.1 a:2.0 n:0.05\n"
+            "# Long snippets can be pasted through the clipboard (@paste, @type or @auto):\n"
+            "if a+d+r { 221B Baker Street, London NW1 6XE, 0, 0, 1.0 } | @paste\n"
+            "# Rules below a [name] line only fire while that profile is active:\n"
+            "[work]\n"
+            "s+g = Best regards"
         )
         self.logic_text.insert("0.0", example)
         self.logic_text.grid(row=1, column=0, columnspan=4, padx=6, pady=6)
@@ -139,13 +135,34 @@ class MacroUI:
         self.refresh_btn = ctk.CTkButton(self.controls_frame, text="Refresh Table", command=self.update_table)
         self.refresh_btn.grid(row=0, column=1, padx=6)
 
-   
+        self.metrics_btn = ctk.CTkButton(self.controls_frame, text="Show Metrics", command=self.toggle_metrics)
+        self.metrics_btn.grid(row=0, column=2, padx=6)
+
+        self.save_btn = ctk.CTkButton(self.controls_frame, text="Save Rules", command=self.save_rules)
+        self.save_btn.grid(row=0, column=3, padx=6)
+
+        self.load_btn = ctk.CTkButton(self.controls_frame, text="Load Rules", command=self.load_rules)
+        self.load_btn.grid(row=0, column=4, padx=6)
+
+        self.export_btn = ctk.CTkButton(self.controls_frame, text="Export Rules", command=self.export_rules)
+        self.export_btn.grid(row=0, column=5, padx=6)
+
+        # Active profile: switching only swaps the engine's compiled matcher
+        self.profile_menu = ctk.CTkOptionMenu(self.controls_frame, values=[NO_PROFILE], command=self._on_profile_selected)
+        self.profile_menu.grid(row=0, column=6, padx=6)
+        self.rules_path = rules_path  # Loaded at startup (through its compiled cache) and offered as the save target
+
+        # Metrics panel (hidden until toggled; refreshed on a throttled after() tick)
+        self.metrics_frame = ctk.CTkFrame(self.window)
+        self.metrics_text = ctk.CTkTextbox(self.metrics_frame, width=1100, height=160, font=("Courier New", 12))
+        self.metrics_text.pack(padx=6, pady=6, fill="x")
+        self.metrics_visible = False
+        self.metrics_job = None
 
         # initial table
         self.update_table()
-
-    def _on_mousewheel(self, event):
-        self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        if os.path.exists(self.rules_path):
+            self._start_load(self.rules_path)
 
     # ---------------------------
     # UI actions
@@ -173,15 +190,33 @@ class MacroUI:
             return
 
         keys = self._parse_keys_input(keys_raw)
+        # New rules go to the profile being edited (the active one)
+        profile = self.engine.active_profile
+        # Off the Tk thread: a rule that starts a new profile compiles that profile's matcher
+        threading.Thread(target=self._add_rule_thread, daemon=True,
+                         args=(keys, output, timeout, char_delay, word_delay, per_char_delays, profile,
+                               self.mode_menu.get())).start()
+
+    def _add_rule_thread(self, keys, output, timeout, char_delay, word_delay, per_char_delays, profile, mode):
         try:
-            self.engine.add_rule(keys, output, timeout, char_delay, word_delay, per_char_delays)
-            self.update_table()
-            # Clear input fields
-            self.keys_entry.delete(0, 'end')
-            self.output_entry.delete(0, 'end')
-            self.per_char_delays_entry.delete(0, 'end')
+            self.engine.add_rule(keys, output, timeout, char_delay, word_delay, per_char_delays, profile=profile,
+                                 mode=mode)
+            self.window.after(0, self._on_rule_added, keys, profile)
         except ValueError as e:
-            messagebox.showerror("Duplicate Rule", str(e))
+            self.window.after(0, messagebox.showerror, "Duplicate Rule", str(e))
+
+    def _on_rule_added(self, keys, profile):
+        if self.search_query:
+            self._run_search()
+        else:
+            rule = self.engine.get_rule(keys, profile)
+            if rule is not None:  # Not already gone again (reload, clear)
+                self.table.insert(rule)
+            self._update_status()
+        # Clear input fields
+        self.keys_entry.delete(0, 'end')
+        self.output_entry.delete(0, 'end')
+        self.per_char_delays_entry.delete(0, 'end')
 
     def add_logic_clauses(self):
         logic_text = self.logic_text.get("0.0", "end").strip()
@@ -210,14 +245,20 @@ class MacroUI:
 
     def _add_logic_thread(self, logic_text, timeout, char_delay, word_delay):
         try:
-            rules_added = self.engine.add_rules_from_logic(logic_text, timeout, char_delay, word_delay)
-            self.window.after(0, self._on_logic_complete, rules_added)
+            result = self.engine.load_logic(logic_text, timeout, char_delay, word_delay)
+            self.window.after(0, self._on_logic_complete, result)
         except Exception as e:
             self.window.after(0, self._on_logic_error, str(e))
 
-    def _on_logic_complete(self, rules_added):
+    def _on_logic_complete(self, result):
         self.update_table()
-        self.status_label.configure(text=f"Successfully added {rules_added} rules - Total: {self.engine.get_rules_count()}")
+        self.status_label.configure(text=f"Successfully added {result.added} rules - Total: {self.engine.get_rules_count()}")
+        if result.diagnostics:
+            shown = "\n".join(str(d) for d in result.diagnostics[:15])
+            more = len(result.diagnostics) - 15
+            if more > 0:
+                shown += f"\n... and {more} more"
+            messagebox.showwarning("Logic Problems", shown)
 
     def _on_logic_error(self, error_msg):
         messagebox.showerror("Processing Error", f"Error processing logic: {error_msg}")
@@ -229,85 +270,192 @@ class MacroUI:
         return parts
 
     def update_table(self):
-        # remove old widgets
-        for row in self.row_widgets:
-            for w in row:
-                try:
-                    w.destroy()
-                except Exception:
-                    pass
-        self.row_widgets.clear()
-
-        # repopulate
-        rules = self.engine.debug_rules()
-        for i, r in enumerate(rules):
-            row = []
-            
-            k_label = ctk.CTkLabel(self.scrollable_frame, text="+".join(r["keys"]))
-            k_label.grid(row=i+1, column=0, padx=6, pady=4, sticky="ew")
-            row.append(k_label)
-
-            o_label = ctk.CTkLabel(self.scrollable_frame, text=r["output"])
-            o_label.grid(row=i+1, column=1, padx=6, pady=4, sticky="ew")
-            row.append(o_label)
+        self._refresh_profiles()
+        if self.search_query:
+            self._run_search()
+            return
+        self.table.set_rows(self.engine.debug_rules())
+        self._update_status()
 
-            t_label = ctk.CTkLabel(self.scrollable_frame, text=f"{r['timeout']:.2f}")
-            t_label.grid(row=i+1, column=2, padx=6, pady=4, sticky="ew")
-            row.append(t_label)
+    def _refresh_profiles(self):
+        self.profile_menu.configure(values=[NO_PROFILE] + self.engine.profile_names())
+        self.profile_menu.set(self.engine.active_profile or NO_PROFILE)
 
-            cd_label = ctk.CTkLabel(self.scrollable_frame, text=f"{r['char_delay']:.3f}")
-            cd_label.grid(row=i+1, column=3, padx=6, pady=4, sticky="ew")
-            row.append(cd_label)
+    def _on_profile_selected(self, choice):
+        try:
+            self.engine.set_active_profile(None if choice == NO_PROFILE else choice)
+        except ValueError as e:  # Removed by a reload since the menu was filled
+            messagebox.showerror("Profile", str(e))
+            self._refresh_profiles()
+            return
+        self.table.render()  # Which rules wait for a longer match depends on the profile
+        self._update_status()
 
-            wd_label = ctk.CTkLabel(self.scrollable_frame, text=f"{r['word_delay']:.3f}")
-            wd_label.grid(row=i+1, column=4, padx=6, pady=4, sticky="ew")
-            row.append(wd_label)
+    def _update_status(self):
+        text = f"Ready - {self.engine.get_rules_count()} rules loaded"
+        if self.engine.active_profile:
+            text += f" - profile '{self.engine.active_profile}'"
+        if self.search_query:
+            text += f" - {len(self.table.rows)} match '{self.search_query}'"
+        self.status_label.configure(text=text)
 
-            # NEW: Per-char delays display
-            per_char_text = ""
-            if r.get("per_char_delays"):
-                per_char_text = ", ".join([f"{k}:{v}" for k, v in r["per_char_delays"].items()])
-            pcd_label = ctk.CTkLabel(self.scrollable_frame, text=per_char_text, wraplength=200)
-            pcd_label.grid(row=i+1, column=5, padx=6, pady=4, sticky="ew")
-            row.append(pcd_label)
+    def _delete_rule_by_repr(self, rule_repr):
+        # Rules are unique by key sequence within a profile; the engine keeps its indexes consistent
+        threading.Thread(target=self._delete_rule_thread, args=(rule_repr,), daemon=True).start()
 
-            del_btn = ctk.CTkButton(self.scrollable_frame, text="Delete", 
-                                  command=lambda rule=r: self._delete_rule_by_repr(rule),
-                                  fg_color="red", hover_color="darkred")
-            del_btn.grid(row=i+1, column=6, padx=6, pady=4)
-            row.append(del_btn)
+    def _delete_rule_thread(self, rule_repr):
+        self.engine.remove_rule(rule_repr["keys"], rule_repr.get("profile"))
+        self.window.after(0, self._on_rule_deleted, rule_repr)
 
-            self.row_widgets.append(row)
+    def _on_rule_deleted(self, rule_repr):
+        self.table.remove(rule_repr)
+        self._update_status()
 
-        # Update status
-        self.status_label.configure(text=f"Ready - {len(rules)} rules loaded")
+    # ---------------------------
+    # Search
+    # ---------------------------
+    def _on_search_key(self, event=None):
+        if self.search_job:
+            self.window.after_cancel(self.search_job)
+        self.search_job = self.window.after(SEARCH_DEBOUNCE_MS, self._run_search)
+
+    def _warm_search(self, event=None):
+        # Build the index while the user is still typing the first characters
+        threading.Thread(target=self.engine.search_index.prepare, daemon=True).start()
+
+    def _run_search(self):
+        self.search_job = None
+        self.search_query = self.search_entry.get().strip()
+        self.search_generation += 1
+        threading.Thread(target=self._search_thread, args=(self.search_query, self.search_generation),
+                         daemon=True).start()
+
+    def _search_thread(self, query, generation):
+        rules = self.engine.search_rules(query)
+        self.window.after(0, self._show_search, rules, generation)
+
+    def _show_search(self, rules, generation):
+        if generation != self.search_generation:
+            return  # A newer query is already on its way
+        self.table.set_rows(rules)
+        self._update_status()
 
-    def _delete_rule_by_repr(self, rule_repr):
-        # find matching rule object from engine.rules and remove
-        for r in list(self.engine.rules):
-            if (r["keys"] == rule_repr["keys"] and 
-                r["output"] == rule_repr["output"] and 
-                float(r["timeout"]) == float(rule_repr["timeout"])):
-                self.engine.rules.remove(r)
-                break
-        self.update_table()
+    # ---------------------------
+    # Metrics panel
+    # ---------------------------
+    METRICS_REFRESH_MS = 1000
+
+    def toggle_metrics(self):
+        self.metrics_visible = not self.metrics_visible
+        if self.metrics_visible:
+            self.metrics_frame.pack(padx=12, pady=6, fill="x")
+            self.metrics_btn.configure(text="Hide Metrics")
+            self._refresh_metrics()
+        else:
+            self.metrics_frame.pack_forget()
+            self.metrics_btn.configure(text="Show Metrics")
+            if self.metrics_job:
+                self.window.after_cancel(self.metrics_job)
+                self.metrics_job = None
+
+    def _refresh_metrics(self):
+        stats = self.engine.get_stats()
+        self.metrics_text.configure(state="normal")
+        self.metrics_text.delete("0.0", "end")
+        self.metrics_text.insert("0.0", self._format_metrics(stats))
+        self.metrics_text.configure(state="disabled")
+        self.metrics_job = self.window.after(self.METRICS_REFRESH_MS, self._refresh_metrics)
+
+    def _format_metrics(self, stats):
+        def ms(value):
+            return f"{value * 1000:9.2f}"
+
+        counters = stats["counters"]
+        queue = stats["output_queue"]
+        lines = [
+            f"keys {counters.get('key_events', 0)}   expansions {counters.get('expansions', 0)}   "
+            f"replays {counters.get('replays', 0)}   queue depth {queue['depth']}/{queue['maxsize']} "
+            f"(peak {queue['max_depth']}, dropped {queue['dropped']}, {queue['policy']})",
+            f"{'phase (ms)':<26}{'count':>8}{'mean':>10}{'p50':>10}{'p99':>10}{'max':>10}",
+        ]
+        for name in ("ingest_lag", "lock_hold_on_key_event", "lock_hold_process_buffer", "match_to_commit",
+                     "queue_wait", "deletion", "typing"):
+            h = stats["histograms"].get(name)
+            if h:
+                lines.append(f"{name:<26}{h['count']:>8}{ms(h['mean'])} {ms(h['p50'])} {ms(h['p99'])} {ms(h['max'])}")
+
+        # Slowest rules by mean typing duration
+        slowest = sorted(stats["rules"].items(), key=lambda item: item[1]["mean"], reverse=True)[:5]
+        for keys, h in slowest:
+            lines.append(f"rule {keys:<21}{h['count']:>8}{ms(h['mean'])} {ms(h['p50'])} {ms(h['p99'])} {ms(h['max'])}")
+        return "\n".join(lines)
 
     def clear_rules(self):
         if messagebox.askyesno("Confirm Clear", "Are you sure you want to clear all rules?"):
             self.engine.clear_rules()
             self.update_table()
 
+    def save_rules(self):
+        path = filedialog.asksaveasfilename(
+            title="Save Rules", defaultextension=".txt",
+            initialdir=os.path.dirname(self.rules_path), initialfile=os.path.basename(self.rules_path),
+            filetypes=[("Logic files", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
+        self.rules_path = path
+        self.status_label.configure(text="Saving rules...")
+        threading.Thread(target=self._save_rules_thread, args=(path,), daemon=True).start()
+
+    def _save_rules_thread(self, path):
+        try:
+            written, skipped = self.engine.save_rules(path)
+            self.window.after(0, self._on_save_complete, path, written, skipped)
+        except Exception as e:
+            self.window.after(0, self._on_logic_error, str(e))
+
+    def _on_save_complete(self, path, written, skipped):
+        self.status_label.configure(text=f"Saved {written} rules to {path}")
+        if skipped:
+            names = ", ".join("+".join(rule["keys"]) for rule in skipped[:15])
+            messagebox.showwarning("Not Saved", f"{len(skipped)} rules cannot be written as logic lines: {names}")
+
+    def load_rules(self):
+        path = filedialog.askopenfilename(
+            title="Load Rules", initialdir=os.path.dirname(self.rules_path),
+            filetypes=[("Logic files", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
+        if self.engine.get_rules_count() and not messagebox.askyesno(
+                "Confirm Load", "Loading replaces the current rules. Continue?"):
+            return
+        self.rules_path = path
+        self._start_load(path)
+
+    def _start_load(self, path):
+        self.status_label.configure(text=f"Loading {path}...")
+        threading.Thread(target=self._load_rules_thread, args=(path,), daemon=True).start()
+
+    def _load_rules_thread(self, path):
+        try:
+            result = self.engine.load_rules(path)
+            # Edits to the file from now on are picked up without a restart
+            self.engine.watch_rules(path, on_reload=self._on_rules_reloaded)
+            self.window.after(0, self._on_logic_complete, result)
+        except Exception as e:
+            self.window.after(0, self._on_logic_error, str(e))
+
+    def _on_rules_reloaded(self, result):
+        # Called on the watcher thread
+        self.window.after(0, self._show_reload, result)
+
+    def _show_reload(self, result):
+        self.update_table()
+        self.status_label.configure(
+            text=f"Reloaded {self.rules_path} - {result.added} rules ({result.reused} unchanged)")
+
     def export_rules(self):
         """Export current rules to logic format"""
-        rules_text = ""
-        for rule in self.engine.debug_rules():
-            base_rule = f"if {'+'.join(rule['keys'])} {{ {rule['output']}, {rule['char_delay']}, {rule['word_delay']}, {rule['timeout']} }}"
-            
-            if rule.get("per_char_delays"):
-                delays_str = " ".join([f"{k}:{v}" for k, v in rule["per_char_delays"].items()])
-                rules_text += f"{base_rule} | {delays_str}\n"
-            else:
-                rules_text += f"{base_rule}\n"
+        rules_text = "\n".join(iter_logic_lines(self.engine.debug_rules()))
         
         # Create export window
         export_window = ctk.CTkToplevel(self.window)
@@ -0,0 +1,185 @@
+# ui/rule_table.py
+import customtkinter as ctk
+
+HEADERS = ["Keys / Sequence", "Output", "Timeout", "CharDelay", "WordDelay", "Per-Char Delays / Mode", "Delete"]
+COLUMN_WIDTHS = (170, 380, 70, 80, 80, 220, 80)
+ROW_HEIGHT = 36  # Label height plus grid padding
+MAX_TEXT = 60  # Longer outputs are cut in the table; the rule itself is untouched
+
+
+def _clip(text):
+    return text if len(text) <= MAX_TEXT else text[:MAX_TEXT - 1] + "…"
+
+
+class RuleTable(ctk.CTkFrame):
+    """
+    Virtualized rule table.
+
+    Only as many rows of widgets exist as fit on screen; scrolling re-labels
+    that pool instead of moving widgets, so the cost of a refresh does not
+    depend on how many rules are loaded. rows is the list being shown (all
+    rules or a filtered subset); insert()/remove() edit it in place and only
+    repaint when the change is on screen.
+    """
+
+    def __init__(self, master, on_delete, waits=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_delete = on_delete
+        self.waits = waits  # rule -> True if it waits for a longer match (depends on the active profile)
+        self.rows = []
+        self.top = 0  # Index of the first visible row
+        self.slots = []  # Pooled widgets per visible row
+        self._shown = []  # (rule, ambiguous) painted into each slot, to skip no-op repaints
+
+        self.header = ctk.CTkFrame(self, fg_color="transparent")
+        self.header.pack(fill="x", padx=(0, 16))
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(self, orientation="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        for frame in (self.header, self.body):
+            for col, width in enumerate(COLUMN_WIDTHS):
+                frame.grid_columnconfigure(col, minsize=width, weight=1 if col == 1 else 0)
+        for col, text in enumerate(HEADERS):
+            ctk.CTkLabel(self.header, text=text, font=("Arial", 12, "bold")).grid(
+                row=0, column=col, padx=6, pady=6, sticky="ew")
+
+        self.body.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.body)
+
+    # -------------------------
+    # Data
+    # -------------------------
+    def set_rows(self, rules):
+        """Show rules (a full refresh, or a new filter result)"""
+        self.rows = list(rules)
+        self.top = min(self.top, max(0, len(self.rows) - len(self.slots)))
+        self.render()
+
+    def insert(self, rule):
+        self.rows.append(rule)
+        if len(self.rows) - 1 < self.top + len(self.slots):
+            self.render()
+        else:
+            self._update_scrollbar()
+
+    def remove(self, rule):
+        """Drop rule from the view; returns False if it was not shown"""
+        for i in range(len(self.rows) - 1, -1, -1):
+            if self.rows[i] is rule:
+                del self.rows[i]
+                break
+        else:
+            return False
+        self.top = min(self.top, max(0, len(self.rows) - len(self.slots)))
+        if i < self.top + len(self.slots):
+            self.render()
+        else:
+            self._update_scrollbar()
+        return True
+
+    # -------------------------
+    # Painting
+    # -------------------------
+    def _make_slot(self, index):
+        widgets = []
+        for col in range(len(HEADERS) - 1):
+            label = ctk.CTkLabel(self.body, text="", anchor="w" if col in (0, 1, 5) else "center")
+            label.grid(row=index, column=col, padx=6, pady=4, sticky="ew")
+            self._bind_wheel(label)
+            widgets.append(label)
+        button = ctk.CTkButton(self.body, text="Delete", width=70, fg_color="red", hover_color="darkred",
+                               command=lambda slot=index: self._delete_slot(slot))
+        button.grid(row=index, column=len(HEADERS) - 1, padx=6, pady=4)
+        widgets.append(button)
+        return widgets
+
+    def _paint(self, slot, rule):
+        ambiguous = self.waits(rule) if self.waits else False
+        if self._shown[slot] == (rule, ambiguous):
+            return
+        keys_label, output_label, timeout_label, char_label, word_label, per_char_label, _ = self.slots[slot]
+        # Ambiguous rules wait out their timeout in case a longer rule follows
+        profile = rule.get("profile")
+        keys_label.configure(text=(f"[{profile}] " if profile else "") + "+".join(rule["keys"])
+                             + ("  (waits)" if ambiguous else ""))
+        output_label.configure(text=_clip(rule["output"]))
+        timeout_label.configure(text=f"{rule['timeout']:.2f}")
+        char_label.configure(text=f"{rule['char_delay']:.3f}")
+        word_label.configure(text=f"{rule['word_delay']:.3f}")
+        per_char = rule.get("per_char_delays")
+        extras = [f"@{rule['mode']}"] if rule.get("mode", "auto") != "auto" else []
+        if per_char:
+            extras.extend(f"{k}:{v}" for k, v in per_char.items())
+        per_char_label.configure(text=_clip(", ".join(extras)))
+        self._shown[slot] = (rule, ambiguous)
+
+    def render(self):
+        for slot, widgets in enumerate(self.slots):
+            index = self.top + slot
+            if index < len(self.rows):
+                if self._shown[slot] is None:
+                    for widget in widgets:
+                        widget.grid()
+                self._paint(slot, self.rows[index])
+            elif self._shown[slot] is not None:
+                for widget in widgets:
+                    widget.grid_remove()
+                self._shown[slot] = None
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.rows)
+        if total <= len(self.slots):
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.top / total, (self.top + len(self.slots)) / total)
+
+    # -------------------------
+    # Events
+    # -------------------------
+    def _on_resize(self, event):
+        wanted = max(1, event.height // ROW_HEIGHT)
+        if wanted == len(self.slots):
+            return
+        while len(self.slots) < wanted:
+            self.slots.append(self._make_slot(len(self.slots)))
+            self._shown.append(False)  # Neither a rule nor hidden: forces the first paint
+        while len(self.slots) > wanted:
+            for widget in self.slots.pop():
+                widget.destroy()
+            self._shown.pop()
+        self.top = min(self.top, max(0, len(self.rows) - len(self.slots)))
+        self.render()
+
+    def scroll_to(self, top):
+        top = max(0, min(top, len(self.rows) - len(self.slots)))
+        if top != self.top:
+            self.top = top
+            self.render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.rows)))
+        elif action == "scroll":
+            step = len(self.slots) if unit == "pages" else 1
+            self.scroll_to(self.top + int(amount) * step)
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4:
+            delta = -3
+        elif getattr(event, "num", None) == 5:
+            delta = 3
+        else:
+            delta = -3 if event.delta > 0 else 3
+        self.scroll_to(self.top + delta)
+
+    def _bind_wheel(self, widget):
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            widget.bind(sequence, self._on_wheel)
+
+    def _delete_slot(self, slot):
+        index = self.top + slot
+        if index < len(self.rows):
+            self.on_delete(self.rows[index])